@@ -1,16 +1,18 @@
 # app.py (修正 import 路徑後)
 
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
+from sqlalchemy.orm import configure_mappers
+import time
 
-from db.init_data import create_tables, init_db
-from db.engine import SessionLocal
+from auth.firebase import get_token_verifier
+from cache.http import CachedStaticFiles
+from db.engine import USE_ASYNC_DB, warm_up_async_pool, warm_up_pool
+from db.migrations import AUTO_MIGRATE, SCHEMA_VERSION, current_schema_version, migrate
 from routers import posts as post_router
-from auth.firebase import init_firebase
-from rag.engine import init_rag_chain
 from routers import chat as chat_router
+from routers import metrics as metrics_router
+from routers import search as search_router
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,17 +20,33 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("--- Lifespan event: startup ---")
+    started = time.perf_counter()
     try:
-        init_firebase()
-        init_rag_chain()
-        # 現在 create_tables() 會確保所有模型都已載入
-        create_tables()
-        
-        db = SessionLocal()
-        init_db(db)
-        db.close()
+        # Firebase Admin SDK 與 RAG 改在第一個需要它們的請求時才初始化，這裡只檢查資料庫版本
+        version = current_schema_version()
+        if version == SCHEMA_VERSION:
+            print(f"資料庫版本 {version} 已是最新，略過建表與初始資料。")
+        elif AUTO_MIGRATE:
+            print(f"資料庫版本 {version} != {SCHEMA_VERSION}，執行 migration...")
+            migrate()
+        else:
+            print(f"⚠️ 資料庫版本 {version} != {SCHEMA_VERSION}，請執行 python -m db.migrations")
+
+        # ORM mapper 的設定 (relationship 解析等，約 30 ms) 原本在第一個查詢時才執行，
+        # 略過 migration 後會落到第一個請求上；在這裡先做完
+        configure_mappers()
+
+        # 依 DB_POOL_WARMUP 預先建立資料庫連線 (預熱實際服務請求的引擎)
+        if USE_ASYNC_DB:
+            await warm_up_async_pool()
+        else:
+            warm_up_pool()
+
+        # 在背景預先下載 token 驗證用的公鑰，第一個需要登入的請求不必等待下載
+        get_token_verifier()
     except Exception as e:
         print(f"啟動過程中發生嚴重錯誤: {e}")
+    print(f"--- 啟動完成，耗時 {(time.perf_counter() - started) * 1000:.1f} ms ---")
     
     yield
     
@@ -36,24 +54,34 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
-app.include_router(post_router.router)
+# DB_ASYNC=1 時改用 async 版本的文章路由 (方便兩種模式並排壓測)
+if USE_ASYNC_DB:
+    from routers import posts_async as post_async_router
+    app.include_router(post_async_router.router)
+else:
+    app.include_router(post_router.router)
+app.include_router(search_router.router)
 app.include_router(chat_router.router)
+app.include_router(metrics_router.router)
+
 
+# --- 靜態檔案服務 ---
+# ETag / Last-Modified / 304 由 StaticFiles 處理，CachedStaticFiles 依檔案類型加上 Cache-Control
+static_files = CachedStaticFiles(directory="static", html=True)
 
-# --- 靜態檔案服務 (以下不變) ---
 @app.get("/")
-async def read_index():
-    return FileResponse('static/index.html')
+async def read_index(request: Request):
+    return await static_files.get_response("index.html", request.scope)
 
 @app.get("/blog.html")
-async def read_blog_html():
-    return FileResponse('static/blog.html')
+async def read_blog_html(request: Request):
+    return await static_files.get_response("blog.html", request.scope)
 
 @app.get("/post.html")
-async def read_post_html():
-    return FileResponse('static/post.html')
+async def read_post_html(request: Request):
+    return await static_files.get_response("post.html", request.scope)
 
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+app.mount("/", static_files, name="static")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,18 +1,45 @@
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, auth
-from fastapi import Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from dotenv import load_dotenv
+from auth.verifier import FirebaseTokenVerifier, resolve_project_id
 
 # 載入環境變數
 load_dotenv()
 
+# firebase_admin 只在第一次需要時 import (見 init_firebase / require_firebase_token)，
+# 不需要登入的請求不必付出載入成本
+
+# 驗證過的 token 快取數量上限
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# 管理者的 Firebase uid (逗號分隔)，可以查看 /api/metrics/*；沒設定時沒有人可以看
+ADMIN_UIDS = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
+
+_token_verifier = None
+
+def get_token_verifier():
+    """
+    取得共用的 FirebaseTokenVerifier (公鑰常駐並於背景更新)。
+    無法得知專案 ID 時回傳 None，改由 firebase_admin 驗證。
+    """
+    global _token_verifier
+    if _token_verifier is None:
+        project_id = resolve_project_id()
+        if not project_id:
+            return None
+        _token_verifier = FirebaseTokenVerifier(project_id, cache_size=TOKEN_CACHE_SIZE)
+        _token_verifier.cert_store.start_background_refresh()
+    return _token_verifier
+
 def init_firebase():
     """
     初始化 Firebase Admin SDK。
     支援從 Vercel 環境變數 (FIREBASE_CREDENTIALS) 或本地檔案 (serviceAccountKey.json) 讀取憑證。
     """
+    import firebase_admin
+    from firebase_admin import credentials
+
     # 1. 檢查是否已經初始化過 (避免重複初始化錯誤)
     if firebase_admin._apps:
         return
@@ -43,16 +70,14 @@ def init_firebase():
     if cred:
         firebase_admin.initialize_app(cred)
 
+    # 5. 預先載入 token 驗證用的公鑰 (之後由背景執行緒更新)
+    get_token_verifier()
+
 
 def require_firebase_token(authorization: str = Header(None)):
     """
     FastAPI Dependency: 驗證 Request Header 中的 Firebase ID Token
     """
-    # 確保在使用驗證功能前，Firebase 已被初始化
-    # 如果您的 app.py 忘記呼叫 init_firebase()，這裡是一個最後的補救措施 (Optional)
-    if not firebase_admin._apps:
-        init_firebase()
-
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -68,6 +93,15 @@ def require_firebase_token(authorization: str = Header(None)):
     token = authorization.split("Bearer ")[1]
 
     try:
+        verifier = get_token_verifier()
+        if verifier:
+            return verifier.verify(token)
+
+        # 無法自行驗證時交給 firebase_admin (第一次使用時才初始化)
+        import firebase_admin
+        from firebase_admin import auth
+        if not firebase_admin._apps:
+            init_firebase()
         decoded_token = auth.verify_id_token(token)
         return decoded_token
     except Exception as e:
@@ -75,4 +109,16 @@ def require_firebase_token(authorization: str = Header(None)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
-        )
\ No newline at end of file
+        )
+
+
+def require_admin(token_payload: dict = Depends(require_firebase_token)):
+    """
+    FastAPI Dependency: 通過 token 驗證且 uid 在 ADMIN_UIDS 中
+    """
+    if token_payload.get("uid") not in ADMIN_UIDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return token_payload
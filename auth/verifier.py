@@ -0,0 +1,156 @@
+# auth/verifier.py
+# Firebase ID Token 驗證：公鑰常駐記憶體並在背景更新，驗證結果依 token 雜湊快取到 exp 為止
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+
+from cache.lru import LRUCache
+
+# Firebase ID Token 的簽章憑證 (x509，kid -> PEM)
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+# 憑證提前多久更新 / 失敗時多久後重試 (秒)
+CERTS_REFRESH_MARGIN = 300
+CERTS_RETRY_INTERVAL = 60
+CERTS_DEFAULT_MAX_AGE = 3600
+
+
+def fetch_google_certs(url: str = FIREBASE_CERTS_URL):
+    """ 下載公鑰憑證，回傳 (certs, max_age)；max_age 取自 Cache-Control """
+    with urllib.request.urlopen(url, timeout=10) as resp:
+        certs = json.loads(resp.read().decode("utf-8"))
+        cache_control = resp.headers.get("Cache-Control", "")
+    match = re.search(r"max-age=(\d+)", cache_control)
+    max_age = int(match.group(1)) if match else CERTS_DEFAULT_MAX_AGE
+    return certs, max_age
+
+
+class CertificateStore:
+    """
+    在記憶體中保存公鑰，並由背景執行緒在到期前更新，
+    讓請求路徑不會因為下載憑證而阻塞。
+    fetch_certs 可替換 (例如測試時改用本地產生的金鑰)。
+    """
+
+    def __init__(self, fetch_certs=fetch_google_certs):
+        self._fetch_certs = fetch_certs
+        self._certs = {}
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        # 同一時間只有一個下載 (背景更新或請求觸發)，其他人等它完成後直接使用結果
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+
+    def refresh(self):
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        self._last_attempt = time.time()
+        certs, max_age = self._fetch_certs()
+        with self._lock:
+            self._certs = dict(certs)
+        return max_age
+
+    def get(self, kid: str):
+        """
+        取得 kid 對應的憑證；只有在記憶體裡完全沒有資料 (或遇到新 kid) 時才同步下載。
+        冷啟動時多個請求同時進來只會下載一次：其他請求等待進行中的下載 (含啟動時的背景預載) 再重新查找。
+        """
+        cert = self._certs.get(kid)
+        if cert is not None:
+            return cert
+        with self._refresh_lock:
+            cert = self._certs.get(kid)
+            # 尚未載入或金鑰剛輪替：同步更新一次 (限制頻率，避免偽造的 kid 反覆觸發下載)
+            if cert is None and time.time() - self._last_attempt > CERTS_RETRY_INTERVAL:
+                self._refresh()
+                cert = self._certs.get(kid)
+        return cert
+
+    def certs(self) -> dict:
+        return self._certs
+
+    def start_background_refresh(self):
+        """ 啟動背景更新執行緒 (重複呼叫無副作用) """
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name="firebase-certs-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                max_age = self.refresh()
+                delay = max(max_age - CERTS_REFRESH_MARGIN, CERTS_RETRY_INTERVAL)
+            except Exception as e:
+                print(f"Firebase 憑證更新失敗: {e}")
+                delay = CERTS_RETRY_INTERVAL
+            time.sleep(delay)
+
+
+class FirebaseTokenVerifier:
+    """
+    驗證 Firebase ID Token (RS256) 並快取解碼後的 claims。
+    快取以 token 的 SHA-256 為 key，在 token 自身的 exp 到期。
+    """
+
+    def __init__(self, project_id: str, cert_store: CertificateStore = None, cache_size: int = 4096):
+        self.project_id = project_id
+        self.cert_store = cert_store or CertificateStore()
+        self.cache = LRUCache(maxsize=cache_size, ttl=0)
+
+    def verify(self, token: str) -> dict:
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self.cache.get(key)
+        if claims is not None:
+            return claims
+
+        claims = self._verify_signature_and_claims(token)
+        self.cache.set(key, claims, expires_at=claims["exp"])
+        return claims
+
+    def _verify_signature_and_claims(self, token: str) -> dict:
+        from google.auth import jwt as google_jwt  # 第一次驗證時才載入 (含 cryptography)
+
+        header = google_jwt.decode_header(token)
+        if header.get("alg") != "RS256":
+            raise ValueError("Firebase ID token has incorrect algorithm")
+        kid = header.get("kid")
+        if not kid or self.cert_store.get(kid) is None:
+            raise ValueError("Firebase ID token has unknown key id")
+
+        claims = google_jwt.decode(token, certs=self.cert_store.certs(), audience=self.project_id)
+
+        if claims.get("iss") != FIREBASE_ISSUER_PREFIX + self.project_id:
+            raise ValueError("Firebase ID token has incorrect issuer")
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise ValueError("Firebase ID token has invalid subject")
+
+        claims["uid"] = sub
+        return claims
+
+
+def resolve_project_id():
+    """ 依序從 FIREBASE_PROJECT_ID、FIREBASE_CREDENTIALS、serviceAccountKey.json 取得專案 ID """
+    project_id = os.getenv("FIREBASE_PROJECT_ID")
+    if project_id:
+        return project_id
+
+    creds_str = os.getenv("FIREBASE_CREDENTIALS")
+    if creds_str:
+        try:
+            return json.loads(creds_str).get("project_id")
+        except json.JSONDecodeError:
+            return None
+
+    if os.path.exists("serviceAccountKey.json"):
+        with open("serviceAccountKey.json", "r", encoding="utf-8") as f:
+            return json.load(f).get("project_id")
+    return None
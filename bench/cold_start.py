@@ -0,0 +1,96 @@
+# bench/cold_start.py
+# 量測冷啟動：從新行程 import app、跑完 lifespan 到第一個 /api/posts 回應的時間
+# 使用方式: python bench/cold_start.py [--runs 5] [--database-url sqlite:///...]
+#
+# fast : 資料庫已是最新版本，啟動只讀一次 schema_version
+# full : 每次啟動前刪除版本標記，強制走 create_all + migration + 初始資料檢查 (舊的啟動流程)
+# 兩種交錯執行，避免磁碟快取等因素讓先跑的一方吃虧；import 時間兩者相同 (差異只是雜訊)，
+# 比較時看 startup + first_request。SQLite 的 DDL/檢查很便宜，差距主要出現在每個檢查都要來回網路的 PostgreSQL。
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子行程中執行，輸出各階段耗時 (ms) 的 JSON
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, {root!r})
+from fastapi.testclient import TestClient  # 量測工具本身 (httpx 等) 的載入不算在 app 的啟動時間內
+t0 = time.perf_counter()
+import app as app_module
+t_import = time.perf_counter()
+with TestClient(app_module.app) as client:
+    t_startup = time.perf_counter()
+    res = client.get("/api/posts")
+    t_first = time.perf_counter()
+    assert res.status_code == 200, res.text
+print(json.dumps({{
+    "import_ms": (t_import - t0) * 1000,
+    "startup_ms": (t_startup - t_import) * 1000,
+    "first_request_ms": (t_first - t_startup) * 1000,
+    "total_ms": (t_first - t0) * 1000,
+}}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def reset_version_marker(env: dict):
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "from sqlalchemy import text\n"
+        "from db.engine import engine\n"
+        "with engine.begin() as conn: conn.execute(text('DELETE FROM schema_version'))\n"
+    ) % ROOT
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, check=True)
+
+
+def summarize(name: str, runs: list):
+    print(f"[{name}]")
+    for run in runs:
+        run["serve_ms"] = run["startup_ms"] + run["first_request_ms"]
+    for key in ("import_ms", "startup_ms", "first_request_ms", "serve_ms", "total_ms"):
+        values = [r[key] for r in runs]
+        print(f"  {key:<18} median {statistics.median(values):8.1f}   min {min(values):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="預設使用暫存的 SQLite 檔案")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "cold_start.db")
+    env["DB_AUTO_MIGRATE"] = "1"
+
+    # 先確保資料庫存在且為最新版本
+    run_once(env)
+
+    fast, full = [], []
+    for _ in range(args.runs):
+        fast.append(run_once(env))
+        reset_version_marker(env)
+        full.append(run_once(env))
+
+    summarize("fast (版本相符)", fast)
+    summarize("full (強制 migration)", full)
+
+
+if __name__ == "__main__":
+    main()
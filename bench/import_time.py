@@ -0,0 +1,95 @@
+# bench/import_time.py
+# import app 的時間分析：-X importtime 依頂層套件彙總，並檢查牆鐘時間預算與不該被載入的重型套件
+# 使用方式: python bench/import_time.py [--budget-ms 1000] [--top 15] [--runs 5]
+# 超出預算或載入了禁止的套件時以非零代碼結束，可放進 CI
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只服務 /api/posts 與靜態檔案的冷啟動不該載入這些套件 (聊天與登入路由第一次執行時才載入)
+FORBIDDEN_PREFIXES = ("langchain", "langchain_core", "langchain_openai", "langchain_pinecone",
+                      "openai", "pinecone", "firebase_admin", "google.auth", "tiktoken")
+
+WALL_CLOCK = r"""
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+elapsed = (time.perf_counter() - t0) * 1000
+loaded = sorted(m for m in sys.modules if m.split(".")[0] in {top!r} or m.startswith({prefixes!r}))
+print(elapsed)
+print(",".join(loaded))
+"""
+
+
+def importtime_breakdown(env: dict) -> dict:
+    """ 回傳 {頂層套件: 自身耗時總和 (us)} """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import app"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    totals = defaultdict(int)
+    for line in out.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, _cumulative, name = line.split("|", 2)
+        totals[name.strip().split(".")[0]] += int(head.split(":", 1)[1])
+    return totals
+
+
+def wall_clock_ms(env: dict):
+    top = tuple(sorted({p.split(".")[0] for p in FORBIDDEN_PREFIXES}))
+    out = subprocess.run(
+        [sys.executable, "-c", WALL_CLOCK.format(root=ROOT, top=top, prefixes=FORBIDDEN_PREFIXES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    lines = out.stdout.strip().splitlines()
+    loaded = [m for m in lines[1].split(",") if m] if len(lines) > 1 else []
+    return float(lines[0]), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+
+    totals = importtime_breakdown(env)
+    grand_total = sum(totals.values())
+    print(f"-X importtime 依頂層套件彙總 (共 {grand_total / 1000:.1f} ms):")
+    for name, us in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {name:<28} {us / 1000:8.1f} ms  {us * 100 / grand_total:5.1f}%")
+
+    samples = []
+    loaded = []
+    for _ in range(args.runs):
+        ms, loaded = wall_clock_ms(env)
+        samples.append(ms)
+    median = statistics.median(samples)
+    print(f"\nimport app 牆鐘時間: median {median:.1f} ms, min {min(samples):.1f} ms (預算 {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if loaded:
+        print(f"❌ 冷啟動載入了不該載入的套件: {', '.join(loaded[:10])}{' ...' if len(loaded) > 10 else ''}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"❌ 超出 import 時間預算 ({median:.1f} ms > {args.budget_ms:.0f} ms)")
+        failed = True
+    if not failed:
+        print("✅ 通過")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench/rag_recall.py
+# 離線評估檢索召回率：對 bench/rag_questions.jsonl 的每個問題，
+# 比較純向量、純 BM25 與混合 (RRF) 檢索在不同 k 下的 recall@k。
+# 使用方式: python bench/rag_recall.py [--k 1 3 5 8 20] [--questions bench/rag_questions.jsonl]
+#
+# relevant 為相關內容的片段 (子字串)，data.txt 切塊後 (與 rag/ingest.py 相同) 包含該片段的塊都算相關。
+# 未設定 OPENAI_API_KEY 時使用 EMBEDDING_MODEL=fake (不需網路)，向量檢索的數字僅供參考；
+# 有 API key 時使用正式模型，embedding 會寫入快取，重跑不會再呼叫 API。
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+if not os.getenv("OPENAI_API_KEY"):
+    os.environ.setdefault("EMBEDDING_MODEL", "fake")
+
+from rag.bm25 import BM25Index, load_corpus_chunks  # noqa: E402
+from rag.corpus import DATA_FILE  # noqa: E402
+from rag.embedding_cache import cached_embeddings  # noqa: E402
+from rag.hybrid import HybridRetriever  # noqa: E402
+from rag.local_index import LocalVectorStore  # noqa: E402
+
+
+def load_questions(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def relevant_lines(lines: list, snippets: list) -> set:
+    return {line for line in lines if any(snippet in line for snippet in snippets)}
+
+
+def recall(retrieved: list, relevant: set) -> float:
+    return len(relevant.intersection(retrieved)) / len(relevant) if relevant else 1.0
+
+
+async def evaluate(questions: list, ks: list, candidate_k: int) -> dict:
+    lines = load_corpus_chunks(DATA_FILE)
+    embeddings = cached_embeddings()
+    store = LocalVectorStore.from_texts(lines, embeddings, model=embeddings.model)
+    bm25 = BM25Index(lines)
+    max_k = max(ks)
+
+    results = {"dense": {k: [] for k in ks}, "bm25": {k: [] for k in ks}, "hybrid": {k: [] for k in ks}}
+    for item in questions:
+        relevant = relevant_lines(lines, item["relevant"])
+        if not relevant:
+            print(f"⚠️ 找不到相關行，略過: {item['question']}")
+            continue
+        question = item["question"]
+        dense = [doc.page_content for doc in await store.asimilarity_search(question, k=max(max_k, candidate_k))]
+        lexical = [lines[i] for i, _ in bm25.search(question, max_k)]
+        for k in ks:
+            hybrid = HybridRetriever(
+                vector_retriever=store.as_retriever(search_kwargs={"k": candidate_k}),
+                bm25=bm25, k=k, candidate_k=candidate_k,
+            )
+            fused = [doc.page_content for doc in await hybrid.ainvoke(question)]
+            results["dense"][k].append(recall(dense[:k], relevant))
+            results["bm25"][k].append(recall(lexical[:k], relevant))
+            results["hybrid"][k].append(recall(fused, relevant))
+    return {
+        name: {k: sum(values) / len(values) for k, values in by_k.items() if values}
+        for name, by_k in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 檢索 recall@k 評估")
+    parser.add_argument("--questions", default=os.path.join(ROOT, "bench", "rag_questions.jsonl"))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 8, 20])
+    parser.add_argument("--candidate-k", type=int, default=20, help="混合檢索時向量/BM25 各取幾筆 (RAG_VECTOR_K)")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    print(f"embedding 模型: {os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')}，問題數: {len(questions)}")
+    scores = asyncio.run(evaluate(questions, args.k, args.candidate_k))
+
+    header = "retriever".ljust(10) + "".join(f"recall@{k}".rjust(12) for k in args.k)
+    print(header)
+    print("-" * len(header))
+    for name, by_k in scores.items():
+        print(name.ljust(10) + "".join(f"{by_k.get(k, 0.0):12.3f}" for k in args.k))
+
+
+if __name__ == "__main__":
+    main()
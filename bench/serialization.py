@@ -0,0 +1,132 @@
+# bench/serialization.py
+# 量測讀取路由每一列的處理成本 (查詢 + 組資料 + JSON 編碼)：
+#   orm  : 載入 ORM 物件 (joinedload / selectinload 作者) → Pydantic from_attributes 驗證 → JSONResponse
+#   fast : 欄位投影 + 明確 join → dict → FastJSONResponse (routers/posts.py 目前的做法)
+# 使用方式: python bench/serialization.py [--rows 2000] [--repeat 20] [--database-url sqlite:///...]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000, help="留言 / 按讚 / 文章各幾筆")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None, help="預設使用暫存的 SQLite 檔案 (資料會寫入該資料庫)")
+    return parser.parse_args()
+
+
+def seed(rows: int):
+    from db.engine import SessionLocal
+    from db.init_data import create_tables
+    from models import authors, comments, likes, posts
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        people = [authors.Author(name=f"bench-{i}", uid=f"bench-{i}", profilePic=f"/img/{i}.png") for i in range(rows)]
+        db.add_all(people)
+        db.flush()
+        hot = posts.Post(slug="bench-hot", title="bench", content="內容" * 200, author_id=people[0].id)
+        db.add(hot)
+        db.add_all(
+            posts.Post(slug=f"bench-{i}", title=f"文章 {i}", content="內容" * 200, author_id=people[i].id)
+            for i in range(1, rows)
+        )
+        db.flush()
+        db.add_all(comments.Comment(text=f"留言 {i} 加油！", post_id=hot.id, author_id=a.id) for i, a in enumerate(people))
+        db.add_all(likes.Like(post_id=hot.id, author_id=a.id) for a in people)
+        db.commit()
+        return hot.id
+    finally:
+        db.close()
+
+
+def orm_cases(post_id: int, rows: int):
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload, load_only, selectinload
+    from typing import List
+    from models import comments, likes, posts
+    from schemas import posts as post_schema
+
+    def render(adapter, objects):
+        # 等同 FastAPI 的 serialize_response：以 response_model 驗證、轉成 JSON 相容資料後編碼
+        return JSONResponse(adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")).body
+
+    comment_list = TypeAdapter(List[post_schema.Comment])
+    like_list = TypeAdapter(List[post_schema.Like])
+    page = TypeAdapter(post_schema.PostPage)
+    return {
+        "comments": lambda db: render(comment_list, db.execute(
+            select(comments.Comment).options(joinedload(comments.Comment.author))
+            .where(comments.Comment.post_id == post_id).order_by(comments.Comment.id)
+        ).scalars().all()),
+        "likes": lambda db: render(like_list, db.execute(
+            select(likes.Like).options(joinedload(likes.Like.author))
+            .where(likes.Like.post_id == post_id).order_by(likes.Like.id)
+        ).scalars().all()),
+        "posts": lambda db: render(page, {"items": db.execute(
+            select(posts.Post).options(
+                load_only(posts.Post.id, posts.Post.slug, posts.Post.title, posts.Post.author_id,
+                          posts.Post.like_count, posts.Post.comment_count),
+                selectinload(posts.Post.author),
+            ).order_by(posts.Post.id).limit(rows)
+        ).scalars().all(), "next_cursor": None}),
+    }
+
+
+def fast_cases(post_id: int, rows: int):
+    from routers.posts import comment_dicts, comments_stmt, like_dicts, likes_stmt, posts_page, posts_page_stmt
+    from routers.responses import FastJSONResponse
+
+    return {
+        "comments": lambda db: FastJSONResponse(comment_dicts(db.execute(comments_stmt(post_id)))).body,
+        "likes": lambda db: FastJSONResponse(like_dicts(db.execute(likes_stmt(post_id)))).body,
+        "posts": lambda db: FastJSONResponse(posts_page(db.execute(posts_page_stmt(None, rows)).all(), rows)).body,
+    }
+
+
+def measure(fn, repeat: int) -> float:
+    from db.engine import SessionLocal
+
+    timings = []
+    for _ in range(repeat):
+        # 每次用新的 session，避免 identity map 讓 ORM 重用上一次的物件
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            fn(db)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    args = parse_args()
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "serialization.db")
+    sys.path.insert(0, ROOT)
+
+    from db.engine import SessionLocal
+
+    post_id = seed(args.rows)
+    orm, fast = orm_cases(post_id, args.rows), fast_cases(post_id, args.rows)
+
+    print(f"每種資料 {args.rows} 列，重複 {args.repeat} 次取中位數 (µs / 列，含查詢)")
+    print(f"  {'':<10}{'orm':>10}{'fast':>10}{'speedup':>10}")
+    for name in ("comments", "likes", "posts"):
+        # 兩種做法的輸出必須一致 (同時當作暖機)
+        with SessionLocal() as db:
+            assert orm[name](db) == fast[name](db), f"{name}: 輸出不一致"
+        before = measure(orm[name], args.repeat) / args.rows * 1e6
+        after = measure(fast[name], args.repeat) / args.rows * 1e6
+        print(f"  {name:<10}{before:>10.2f}{after:>10.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# cache/http.py
+# HTTP 條件式快取：ETag 由版本欄位 (updated_at / 計數器) 組成，不需要先產生回應內容再雜湊；
+# 符合 If-None-Match / If-Modified-Since 時直接回 304，讓瀏覽器與 Vercel CDN 吸收大部分的讀取流量。
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+
+# 各類資源的 Cache-Control。API 一律 max-age=0 (瀏覽器本身每次以 ETag 重新驗證)，
+# 但 s-maxage 讓 CDN 在短時間內直接回應，過期後 stale-while-revalidate 期間還會先回舊內容並在背景更新，
+# 所以經過 CDN 的讀取最多可能落後 s-maxage + stale-while-revalidate 秒，寫入後不一定馬上看得到。
+# 留言/按讚列表與文章詳情 (/detail，含留言與按讚，post.js 按讚/留言後重新讀取) 是使用者寫入後會立刻重新讀取的資源，TTL 設得最短
+CACHE_CONTROL_POST_LIST = os.getenv(
+    "CACHE_CONTROL_POST_LIST", "public, max-age=0, s-maxage=30, stale-while-revalidate=60"
+)
+CACHE_CONTROL_POST = os.getenv(
+    "CACHE_CONTROL_POST", "public, max-age=0, s-maxage=10, stale-while-revalidate=60"
+)
+CACHE_CONTROL_POST_CHILDREN = os.getenv(
+    "CACHE_CONTROL_POST_CHILDREN", "public, max-age=0, s-maxage=1, stale-while-revalidate=2"
+)
+CACHE_CONTROL_SEARCH = os.getenv(
+    "CACHE_CONTROL_SEARCH", "public, max-age=0, s-maxage=30, stale-while-revalidate=60"
+)
+# 靜態檔案：每次部署 Vercel 會清除 CDN 快取，所以 CDN 可以放久一點；
+# 檔名沒有雜湊，瀏覽器端的 JS/CSS/圖片只快取幾分鐘，HTML 每次重新驗證
+CACHE_CONTROL_HTML = os.getenv("CACHE_CONTROL_HTML", "public, max-age=0, must-revalidate, s-maxage=3600")
+CACHE_CONTROL_ASSET = os.getenv(
+    "CACHE_CONTROL_ASSET", "public, max-age=300, s-maxage=86400, stale-while-revalidate=86400"
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_utc(dt: datetime) -> datetime:
+    """ SQLite 讀回的時間沒有時區，一律視為 UTC """
+    if dt is None:
+        return _EPOCH
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def version_token(dt: datetime) -> int:
+    """ 時間戳轉成整數 (微秒)，放進 ETag """
+    delta = to_utc(dt) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def make_etag(*parts, weak: bool = True) -> str:
+    """ 以版本欄位組成 ETag；內容由版本決定但序列化細節可能不同，預設為 weak """
+    tag = "-".join(str(part) for part in parts)
+    return f'W/"{tag}"' if weak else f'"{tag}"'
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(to_utc(dt).replace(microsecond=0), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match 使用 weak comparison：忽略 W/ 前綴
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """ 有 If-None-Match 時只比對 ETag (忽略 If-Modified-Since)，否則比對 Last-Modified (秒) """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return to_utc(last_modified).replace(microsecond=0) <= to_utc(since)
+    return False
+
+
+def cache_headers(etag: str, last_modified: datetime = None, cache_control: str = CACHE_CONTROL_POST) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional_response(request: Request, response: Response, etag: str, last_modified: datetime = None,
+                         cache_control: str = CACHE_CONTROL_POST):
+    """
+    設定快取標頭。請求的版本仍是最新時回傳 304 Response (路由直接回傳它，不必查詢內容)；
+    否則把標頭加到 response 上並回傳 None，由路由繼續產生內容。
+    """
+    headers = cache_headers(etag, last_modified, cache_control)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+class CachedStaticFiles(StaticFiles):
+    """ StaticFiles 已處理 ETag / Last-Modified 與 304，這裡依檔案類型加上 Cache-Control """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        html = str(full_path).endswith(".html")
+        response.headers["Cache-Control"] = CACHE_CONTROL_HTML if html else CACHE_CONTROL_ASSET
+        return response
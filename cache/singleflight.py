@@ -0,0 +1,202 @@
+# cache/singleflight.py
+# 請求合併 (single-flight)：相同 key 同時進行中的請求只執行一次上游運算，所有呼叫者拿到同一個結果。
+# 上游丟出的例外會原樣傳給每個等待者；運算結束後立即移除，之後的請求會重新執行 (這裡不是快取)。
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    給同步程式碼 (threadpool 中的路由) 使用。
+    等待者最多等 timeout 秒；逾時就自己執行 fn，不會因為領頭的請求卡住而跟著卡住。
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    __slots__ = ("task", "chunks", "done", "error", "changed", "subscribers")
+
+    def __init__(self):
+        self.task = None
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.subscribers = 0
+
+
+class AsyncSingleFlight:
+    """
+    給 async 程式碼使用 (同一個 event loop 內合併)。
+    - do(): 等待共用的 task；單一等待者逾時或被取消不影響其他人，
+      所有等待者都離開時才取消上游運算。
+    - do_owned(): 同 SingleFlight.do，fn 使用呼叫者自己的資源 (例如請求的 DB session)：
+      領頭者的 fn 被共用，等待者逾時就以自己的 fn 查詢。
+    - stream(): 共用一個 async generator，後加入的訂閱者會先補上已產生的片段；
+      所有訂閱者都離開時關閉上游 generator。
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._streams = {}
+        self.executions = 0
+        self.shared = 0
+
+    def in_flight(self, key) -> bool:
+        return key in self._flights or key in self._streams
+
+    def _finish(self, key, flight, task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # 沒有等待者時也取出例外，避免 "exception was never retrieved"
+
+    async def do(self, key, fn, timeout: float = None):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task, key=key, flight=flight: self._finish(key, flight, task))
+            self.executions += 1
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    async def do_owned(self, key, fn, timeout: float = None):
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+            try:
+                return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+            except asyncio.TimeoutError:
+                return await fn()
+
+        flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+        flight.task.add_done_callback(lambda task, key=key, flight=flight: self._finish(key, flight, task))
+        self.executions += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # 領頭的請求被取消時 fn 仍在使用它的資源 (session)：等 fn 跑完才離開，
+            # 資源不會在使用中被釋放，其他等待者也照樣拿到結果
+            while not flight.task.done():
+                try:
+                    await asyncio.wait({flight.task})
+                except asyncio.CancelledError:
+                    continue
+            raise
+
+    async def _produce(self, key, broadcast, agen):
+        try:
+            async for chunk in agen:
+                async with broadcast.changed:
+                    broadcast.chunks.append(chunk)
+                    broadcast.changed.notify_all()
+        except BaseException as e:
+            broadcast.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            await agen.aclose()
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            async with broadcast.changed:
+                broadcast.done = True
+                broadcast.changed.notify_all()
+
+    async def stream(self, key, agen_factory):
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = self._streams[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._produce(key, broadcast, agen_factory()))
+            self.executions += 1
+        else:
+            self.shared += 1
+
+        broadcast.subscribers += 1
+        sent = 0
+        try:
+            while True:
+                async with broadcast.changed:
+                    await broadcast.changed.wait_for(lambda: len(broadcast.chunks) > sent or broadcast.done)
+                    pending = broadcast.chunks[sent:]
+                    finished = broadcast.done
+                for chunk in pending:
+                    yield chunk
+                sent += len(pending)
+                if finished and sent == len(broadcast.chunks):
+                    if broadcast.error is not None and not isinstance(broadcast.error, asyncio.CancelledError):
+                        raise broadcast.error
+                    return
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                broadcast.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "executions": self.executions,
+            "shared": self.shared,
+            "in_flight": len(self._flights) + len(self._streams),
+        }
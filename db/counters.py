@@ -0,0 +1,39 @@
+# db/counters.py
+# 重建 posts.like_count / posts.comment_count 計數器
+# 使用方式: python -m db.counters
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from db.engine import SessionLocal
+from db.migrations import ensure_counter_columns
+from models import authors, posts, comments, likes
+
+def rebuild_post_counters(db: Session):
+    """ 以 likes / comments 表格的實際筆數覆寫所有文章的計數器 """
+    like_total = (
+        select(func.count(likes.Like.id))
+        .where(likes.Like.post_id == posts.Post.id)
+        .scalar_subquery()
+    )
+    comment_total = (
+        select(func.count(comments.Comment.id))
+        .where(comments.Comment.post_id == posts.Post.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(posts.Post).values(like_count=like_total, comment_count=comment_total)
+    )
+    db.commit()
+    return result.rowcount
+
+def main():
+    ensure_counter_columns()
+    db = SessionLocal()
+    try:
+        updated = rebuild_post_counters(db)
+        print(f"db.counters: 已重建 {updated} 篇文章的計數器。")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
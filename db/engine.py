@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 import os
 from dotenv import load_dotenv
+from db.pool import detect_pool_profile, engine_kwargs, pool_metrics, pool_status
 
 # 載入 .env 檔案
 load_dotenv()
@@ -19,8 +21,28 @@ if not DATABASE_URL:
     # 建議：在本機開發時，將網址寫在 .env 檔案中
     print("Warning: DATABASE_URL not found in environment variables.")
 
+# 依部署環境選擇連線池 (server / serverless / sqlite / test)，見 db/pool.py
+POOL_PROFILE = detect_pool_profile(DATABASE_URL)
+if POOL_PROFILE == "test" and not DATABASE_URL:
+    DATABASE_URL = "sqlite://"
+
+def _engine_kwargs(url: str, is_async: bool = False, connect_args: dict = None) -> dict:
+    kwargs = engine_kwargs(POOL_PROFILE, is_async=is_async)
+    merged = dict(connect_args or {})
+    if url.startswith("sqlite"):
+        merged.update(kwargs.pop("connect_args", {}))
+    else:
+        kwargs.pop("connect_args", None)
+        if is_async and POOL_PROFILE == "serverless":
+            # PgBouncer (transaction mode) 不支援 asyncpg 的 prepared statement 快取
+            merged["statement_cache_size"] = 0
+    if merged:
+        kwargs["connect_args"] = merged
+    return kwargs
+
 # 建立資料庫引擎
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+event.listen(engine.pool, "connect", lambda *args: pool_metrics.record_connect())
 
 # 建立 SessionLocal 類別
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -34,4 +56,101 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- 非同步模式 (DB_ASYNC=1) ---
+# 開啟後 app.py 改掛 routers/posts_async.py，請求等待資料庫時不會佔用 threadpool 的執行緒
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+def to_async_url(url: str):
+    """
+    將同步網址轉為 asyncio driver 的網址 (postgresql -> asyncpg, sqlite -> aiosqlite)。
+    asyncpg 不認得 sslmode / channel_binding 參數，改以 connect_args 的 ssl 傳入。
+    回傳 (async_url, connect_args)。
+    """
+    from sqlalchemy.engine import make_url
+
+    u = make_url(url)
+    connect_args = {}
+    if u.drivername in ("postgresql", "postgresql+psycopg2"):
+        query = dict(u.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = True
+        u = u.set(drivername="postgresql+asyncpg", query=query)
+    elif u.drivername == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    return u.render_as_string(hide_password=False), connect_args
+
+async_engine = None
+AsyncSessionLocal = None
+
+if USE_ASYNC_DB and DATABASE_URL:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+    _async_url, _async_connect_args = to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_url, **_engine_kwargs(_async_url, is_async=True, connect_args=_async_connect_args)
+    )
+    event.listen(async_engine.sync_engine.pool, "connect", lambda *args: pool_metrics.record_connect())
+    # expire_on_commit=False：commit 後回傳的物件不會再觸發 (asyncio 下不允許的) lazy load
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+# 非同步版本的資料庫依賴函式
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _warm_up_count(pool, connections: int = None) -> int:
+    """ 要預熱的連線數；NullPool 不保留連線，預熱沒有意義，回傳 0 """
+    if connections is None:
+        connections = int(os.getenv("DB_POOL_WARMUP", "0"))
+    if connections <= 0 or POOL_PROFILE == "test" or isinstance(pool, NullPool):
+        return 0
+    return connections
+
+def warm_up_pool(connections: int = None):
+    """
+    啟動時預先建立同步引擎的連線 (DB_POOL_WARMUP 條)，讓第一個請求不必等待建立連線。
+    DB_ASYNC=1 時請求由 async_engine 服務，改用 warm_up_async_pool()。
+    """
+    connections = _warm_up_count(engine.pool, connections)
+    if not connections:
+        return
+    conns = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    finally:
+        for conn in conns:
+            conn.close()
+    print(f"db.engine: 已預熱 {len(conns)} 條資料庫連線 ({POOL_PROFILE})")
+
+async def warm_up_async_pool(connections: int = None):
+    """ 同 warm_up_pool，預熱 async_engine 的連線池 (DB_ASYNC=1 時由 lifespan 呼叫) """
+    connections = _warm_up_count(async_engine.pool, connections)
+    if not connections:
+        return
+    conns = []
+    try:
+        for _ in range(connections):
+            conn = await async_engine.connect()
+            await conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    finally:
+        for conn in conns:
+            await conn.close()
+    print(f"db.engine: 已預熱 {len(conns)} 條 async 資料庫連線 ({POOL_PROFILE})")
+
+def get_pool_status() -> dict:
+    """ 目前連線池狀態與等待時間統計 """
+    status = pool_status(engine, POOL_PROFILE)
+    if async_engine is not None:
+        status["async_pool"] = async_engine.pool.status()
+    return status
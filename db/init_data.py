@@ -3,7 +3,9 @@
 from sqlalchemy.orm import Session
 from db.engine import engine, Base 
 from data.init_posts import posts as initial_posts_data
-from models import authors, posts, comments, likes 
+from models import authors, posts, comments, likes, schema_version, rag_index, search
+# 載入即註冊 after_flush：寫入文章/留言 (包含初始資料) 時同步更新搜尋文件
+from db import search as search_index
 
 def create_tables():
     print("db.init_data: 正在執行 Base.metadata.create_all()...")
@@ -36,7 +38,9 @@ def init_db(db: Session):
                 slug=post_data.get("slug"),
                 title=post_data.get("title"),
                 content=post_data.get("content"),
-                author=db_author  # <--- 使用物件關聯，而不是 ID
+                author=db_author,  # <--- 使用物件關聯，而不是 ID
+                like_count=len(post_data.get("likes", [])),
+                comment_count=len(post_data.get("comments", [])),
             )
             db.add(new_post)
 
@@ -0,0 +1,163 @@
+# db/migrations.py
+# 建立表格、補上 create_all() 不會處理的結構變更、寫入初始資料，最後更新版本標記
+# 使用方式: python -m db.migrations
+
+import json
+import os
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from db.engine import engine, SessionLocal, POOL_PROFILE
+from db.init_data import create_tables, init_db
+from db.search import ensure_search_index
+from models.schema_version import SchemaVersion
+
+# 結構與初始資料的版本，修改模型或新增 migration 時請 +1
+SCHEMA_VERSION = 5
+
+# 舊作者與 Firebase uid 的對應檔 (見 claim_legacy_authors)，不存在時略過
+LEGACY_AUTHORS_FILE = os.getenv("LEGACY_AUTHORS_FILE", "legacy_authors.json")
+
+# 版本不符時是否在啟動時自動 migration；serverless 預設關閉，改由部署流程執行 CLI
+AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0" if POOL_PROFILE == "serverless" else "1").lower() in ("1", "true", "yes")
+
+def ensure_counter_columns() -> bool:
+    """ 舊資料庫 (create_all 不會 ALTER) 補上計數器欄位；有新增欄位時回傳 True (計數器需要重建) """
+    existing = {col["name"] for col in inspect(engine).get_columns("posts")}
+    added = False
+    with engine.begin() as conn:
+        for name in ("like_count", "comment_count"):
+            if name not in existing:
+                print(f"db.migrations: 新增欄位 posts.{name}")
+                conn.execute(text(f"ALTER TABLE posts ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+                added = True
+    return added
+
+def ensure_like_unique_constraint() -> int:
+    """ 刪除重複的按讚後，建立 (post_id, author_id) 唯一索引；回傳刪除的筆數 """
+    with engine.begin() as conn:
+        removed = conn.execute(text(
+            "DELETE FROM likes WHERE id NOT IN ("
+            " SELECT MIN(id) FROM likes GROUP BY post_id, author_id)"
+        )).rowcount
+        if removed:
+            print(f"db.migrations: 已刪除 {removed} 筆重複的按讚")
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_likes_post_author ON likes (post_id, author_id)"
+        ))
+    return removed
+
+def ensure_author_uid():
+    """ 作者改以 Firebase uid 識別：新增 uid 欄位與唯一索引，name 改為一般索引 """
+    existing = {col["name"] for col in inspect(engine).get_columns("authors")}
+    with engine.begin() as conn:
+        if "uid" not in existing:
+            print("db.migrations: 新增欄位 authors.uid")
+            conn.execute(text("ALTER TABLE authors ADD COLUMN uid VARCHAR"))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_authors_uid ON authors (uid)"))
+
+    name_index = next((ix for ix in inspect(engine).get_indexes("authors") if ix["name"] == "ix_authors_name"), None)
+    if name_index and name_index["unique"]:
+        print("db.migrations: authors.name 改為非唯一索引")
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_authors_name"))
+            conn.execute(text("CREATE INDEX ix_authors_name ON authors (name)"))
+
+def claim_legacy_authors() -> int:
+    """
+    依 LEGACY_AUTHORS_FILE ({"作者名稱": "Firebase uid", ...}) 把尚未綁定 uid 的舊作者綁定到指定的 uid。
+    對應由管理者明確指定，不再以顯示名稱自動接手 (同名的使用者不能取得別人的舊資料)。
+    該 uid 已經有自己的作者資料時，把它的文章/留言/按讚併入舊作者後刪除。回傳被刪除的重複按讚數
+    """
+    if not os.path.exists(LEGACY_AUTHORS_FILE):
+        return 0
+    with open(LEGACY_AUTHORS_FILE, "r", encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    removed_likes = 0
+    with engine.begin() as conn:
+        for name, uid in mapping.items():
+            legacy = conn.execute(
+                text("SELECT id FROM authors WHERE name = :name AND uid IS NULL"), {"name": name}
+            ).scalars().all()
+            if len(legacy) != 1:
+                if len(legacy) > 1:
+                    print(f"⚠️ db.migrations: 有 {len(legacy)} 位未綁定的作者名為 {name}，略過")
+                continue
+            params = {"legacy": legacy[0], "uid": uid}
+            current = conn.execute(text("SELECT id FROM authors WHERE uid = :uid"), params).scalar()
+            if current is not None:
+                params["current"] = current
+                # 同一篇文章兩邊都按過讚時只保留舊作者的 (likes 有 (post_id, author_id) 唯一索引)
+                removed_likes += conn.execute(text(
+                    "DELETE FROM likes WHERE author_id = :current AND post_id IN ("
+                    " SELECT post_id FROM likes WHERE author_id = :legacy)"
+                ), params).rowcount
+                for table in ("posts", "comments", "likes"):
+                    conn.execute(text(f"UPDATE {table} SET author_id = :legacy WHERE author_id = :current"), params)
+                conn.execute(text("DELETE FROM authors WHERE id = :current"), params)
+            conn.execute(text("UPDATE authors SET uid = :uid WHERE id = :legacy"), params)
+            print(f"db.migrations: 作者 {name} 已綁定 uid {uid}")
+    return removed_likes
+
+def ensure_updated_at_columns():
+    """ 補上 posts / comments / likes 的 updated_at (HTTP 快取的版本)，既有資料以目前時間填入 """
+    postgres = engine.dialect.name == "postgresql"
+    for table in ("posts", "comments", "likes"):
+        existing = {col["name"] for col in inspect(engine).get_columns(table)}
+        if "updated_at" in existing:
+            continue
+        print(f"db.migrations: 新增欄位 {table}.updated_at")
+        with engine.begin() as conn:
+            if postgres:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()"
+                ))
+            else:
+                # SQLite 的 ADD COLUMN 不接受 CURRENT_TIMESTAMP 這類非常數預設值，先加欄位再補值
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+                conn.execute(text(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+
+def current_schema_version():
+    """ 以主鍵讀取版本標記；表格尚不存在時回傳 None """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+def schema_is_current() -> bool:
+    return current_schema_version() == SCHEMA_VERSION
+
+def migrate():
+    """ 完整的 migration + 初始資料，完成後寫入版本標記 """
+    # db.counters 會 import 這個模組，放在函式內避免循環 import
+    from db.counters import rebuild_post_counters
+
+    previous_version = current_schema_version()
+    create_tables()
+    columns_added = ensure_counter_columns()
+    duplicates_removed = ensure_like_unique_constraint()
+    ensure_author_uid()
+    merged_likes = claim_legacy_authors()
+    ensure_updated_at_columns()
+    # 版本 5 起搜尋文件多了單字 token (db/search.py 的 search_tokens)，之前寫入的文件要重建
+    ensure_search_index(rebuild=previous_version is not None and previous_version < 5)
+
+    db = SessionLocal()
+    try:
+        # 計數器只會遞增/遞減：剛補上的欄位 (預設 0) 或刪除過按讚時，必須以實際筆數重建一次
+        if columns_added or duplicates_removed or merged_likes:
+            updated = rebuild_post_counters(db)
+            print(f"db.migrations: 已重建 {updated} 篇文章的計數器")
+        init_db(db)
+        db.merge(SchemaVersion(id=1, version=SCHEMA_VERSION))
+        db.commit()
+    finally:
+        db.close()
+    print(f"db.migrations: 完成，版本 {SCHEMA_VERSION}。")
+
+def main():
+    migrate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# db/pool.py
+# 依部署環境選擇連線池設定 (DB_POOL_PROFILE)，並統計取得連線的次數與等待時間
+import os
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool, AsyncAdaptedQueuePool
+
+# server     : 長駐的 uvicorn 行程，調整過的 QueuePool + pre-ping + recycle
+# serverless : Vercel 等每個冷啟動實例各自連線，預設 NullPool (交給 Neon/PgBouncer 做 pooling)，
+#              設定 DB_POOL_SIZE 則改用小型 QueuePool
+# sqlite     : 檔案型 SQLite，一般的 QueuePool (每個 session 各自一條連線、各自的交易)
+# test       : in-memory SQLite + StaticPool，所有 session 共用同一條連線 (in-memory 資料庫只存在於單一連線)
+POOL_PROFILES = ("server", "serverless", "sqlite", "test")
+
+
+def is_memory_sqlite(database_url: str) -> bool:
+    """ sqlite:// 、sqlite:///:memory: 或 mode=memory 的 URI """
+    if not database_url:
+        return True
+    url = make_url(database_url)
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def detect_pool_profile(database_url: str) -> str:
+    profile = os.getenv("DB_POOL_PROFILE")
+    if profile:
+        if profile not in POOL_PROFILES:
+            raise ValueError(f"未知的 DB_POOL_PROFILE: {profile} (可用: {', '.join(POOL_PROFILES)})")
+        return profile
+    if database_url and database_url.startswith("sqlite"):
+        # 共用一條連線時 session 之間沒有交易隔離，只有 in-memory 資料庫需要這樣做
+        return "test" if is_memory_sqlite(database_url) else "sqlite"
+    if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return "serverless"
+    return "server"
+
+
+class PoolMetrics:
+    """ 連線池統計：取得連線次數、新建連線次數、逾時/失敗次數、等待時間 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, error: Exception = None):
+        with self._lock:
+            if error is not None:
+                if isinstance(error, PoolTimeoutError):
+                    self.timeouts += 1
+                else:
+                    self.errors += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def metered(pool_cls):
+    """ 包裝連線池類別，統計每次從池中取得連線所花的時間 """
+
+    class MeteredPool(pool_cls):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except Exception as e:
+                pool_metrics.record_wait(time.perf_counter() - start, error=e)
+                raise
+            pool_metrics.record_wait(time.perf_counter() - start)
+            return conn
+
+    MeteredPool.__name__ = f"Metered{pool_cls.__name__}"
+    return MeteredPool
+
+
+def engine_kwargs(profile: str, is_async: bool = False) -> dict:
+    """ 依 profile 產生 create_engine / create_async_engine 的參數 """
+    queue_pool = AsyncAdaptedQueuePool if is_async else QueuePool
+
+    if profile == "test":
+        return {
+            "poolclass": metered(StaticPool),
+            "connect_args": {"check_same_thread": False},
+        }
+
+    if profile == "sqlite":
+        # 連線在 threadpool 的執行緒之間借還，但同一時間只有一個執行緒使用
+        return {
+            "poolclass": metered(queue_pool),
+            "connect_args": {"check_same_thread": False},
+        }
+
+    if profile == "serverless":
+        pool_size = os.getenv("DB_POOL_SIZE")
+        if not pool_size:
+            return {"poolclass": metered(NullPool)}
+        return {
+            "poolclass": metered(queue_pool),
+            "pool_size": int(pool_size),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "0")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "300")),
+            "pool_pre_ping": True,
+        }
+
+    return {
+        "poolclass": metered(queue_pool),
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+def pool_status(engine, profile: str) -> dict:
+    stats = {"profile": profile, "pool": engine.pool.status()}
+    stats.update(pool_metrics.snapshot())
+    return stats
@@ -0,0 +1,310 @@
+# db/search.py
+# 文章與留言的全文檢索 (GET /api/search)。
+# 中文以 bigram 斷詞 (rag/text.py)，斷好的詞存在 search_documents，由資料庫建立倒排索引：
+#   PostgreSQL : 產生欄位 tsv = to_tsvector('simple', ...) + GIN 索引 (寫入時由資料庫計算)
+#   SQLite     : FTS5 虛擬表 search_fts (external content)，以觸發器與 search_documents 同步
+# 查詢一律走索引，不做 LIKE '%..%' 全表掃描；空白分隔的多個詞之間為 AND，
+# 同一個詞的 bigram 必須相鄰 (phrase)，效果等同子字串比對。
+# 單一漢字沒有 bigram 可比對，文件在 bigram 之後另外附上每個漢字 (search_tokens)，以單字 token 查詢。
+# 文章/留言以 ORM 寫入時，after_flush 會在同一個交易中更新 search_documents。
+# 使用方式: python -m db.search  (重建所有搜尋文件)
+import base64
+import html
+import os
+import re
+
+from sqlalchemy import delete, event, insert, inspect, select, text
+from sqlalchemy.orm import Session
+
+from db.engine import engine
+# authors / likes 也要載入，relationship 才能完成設定 (以 python -m db.search 單獨執行時)
+from models import authors, comments as comment_model, likes, posts as post_model
+from models.search import SearchDocument
+from rag.text import strip_html, token_runs, tokenize
+
+SEARCH_PAGE_SIZE = 10
+SEARCH_PAGE_SIZE_MAX = 50
+SEARCH_QUERY_MAX_LENGTH = 100
+# 摘要的字數 (符合的詞之前保留約 1/4)
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "120"))
+# SQLite bm25 的標題欄位權重 (PostgreSQL 以 setweight A / D 區分，預設權重 1.0 / 0.1)
+SEARCH_TITLE_WEIGHT = float(os.getenv("SEARCH_TITLE_WEIGHT", "3.0"))
+SEARCH_REBUILD_BATCH_SIZE = 500
+
+_documents = SearchDocument.__table__
+
+_PG_DDL = (
+    """
+    ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title_tokens), 'A') || setweight(to_tsvector('simple', body_tokens), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)",
+)
+
+_SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title_tokens, body_tokens, content='search_documents', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts (rowid, title_tokens, body_tokens) VALUES (new.id, new.title_tokens, new.body_tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts (search_fts, rowid, title_tokens, body_tokens)
+        VALUES ('delete', old.id, old.title_tokens, old.body_tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts (search_fts, rowid, title_tokens, body_tokens)
+        VALUES ('delete', old.id, old.title_tokens, old.body_tokens);
+        INSERT INTO search_fts (rowid, title_tokens, body_tokens) VALUES (new.id, new.title_tokens, new.body_tokens);
+    END
+    """,
+)
+
+# 依分數、id 遞減排序；after 為 keyset 分頁條件 (上一頁最後一筆的分數與 id)
+_SEARCH_SQL = {
+    "postgresql": (
+        """
+        SELECT id, score FROM (
+            SELECT d.id, ts_rank_cd(d.tsv, query) AS score
+            FROM search_documents d, to_tsquery('simple', :query) query
+            WHERE d.tsv @@ query
+        ) ranked
+        {after}
+        ORDER BY score DESC, id DESC
+        LIMIT :limit
+        """,
+        # ts_rank_cd 回傳 real，游標的分數也轉成 real 再比較
+        "WHERE score < CAST(:score AS real) OR (score = CAST(:score AS real) AND id < :id)",
+    ),
+    "sqlite": (
+        """
+        SELECT id, score FROM (
+            SELECT rowid AS id, -bm25(search_fts, :title_weight, 1.0) AS score
+            FROM search_fts
+            WHERE search_fts MATCH :query
+        ) ranked
+        {after}
+        ORDER BY score DESC, id DESC
+        LIMIT :limit
+        """,
+        "WHERE score < :score OR (score = :score AND id < :id)",
+    ),
+}
+
+
+# --- 文件 ---
+
+def search_tokens(text: str) -> str:
+    """
+    bigram (tokenize) 之後附上多字漢字段的每個字：單一漢字的查詢以單字 token 比對，
+    只出現在詞尾的字 (不是任何 bigram 的開頭) 也找得到。單字放在全部 bigram 之後，不影響詞組的相鄰關係
+    """
+    chars = [char for run in token_runs(text) if not run.isascii() and len(run) > 1 for char in run]
+    return " ".join(tokenize(text) + chars)
+
+def post_document(post_id: int, title: str, content: str) -> dict:
+    body = strip_html(content or "")
+    return {
+        "kind": "post", "ref_id": post_id, "post_id": post_id, "body": body,
+        "title_tokens": search_tokens(title or ""), "body_tokens": search_tokens(body),
+    }
+
+def comment_document(comment_id: int, post_id: int, comment_text: str) -> dict:
+    return {
+        "kind": "comment", "ref_id": comment_id, "post_id": post_id, "body": comment_text or "",
+        "title_tokens": "", "body_tokens": search_tokens(comment_text or ""),
+    }
+
+def write_documents(conn, documents: list, removed: list = ()):
+    """ 以 (kind, ref_id) 取代或刪除文件；SQLite 的 FTS 由觸發器同步 """
+    keys = list(removed) + [(doc["kind"], doc["ref_id"]) for doc in documents]
+    for kind in ("post", "comment"):
+        ref_ids = [ref_id for key_kind, ref_id in keys if key_kind == kind]
+        if ref_ids:
+            conn.execute(delete(_documents).where(_documents.c.kind == kind, _documents.c.ref_id.in_(ref_ids)))
+    if documents:
+        conn.execute(insert(_documents), documents)
+
+def _changed(obj, *names) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in names)
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_documents(session, flush_context):
+    # after_flush 時 new / dirty / deleted 仍是這次 flush 的內容，主鍵已經產生
+    documents, removed = [], []
+    for obj in session.new:
+        if isinstance(obj, post_model.Post):
+            documents.append(post_document(obj.id, obj.title, obj.content))
+        elif isinstance(obj, comment_model.Comment):
+            documents.append(comment_document(obj.id, obj.post_id, obj.text))
+    for obj in session.dirty:
+        if isinstance(obj, post_model.Post) and _changed(obj, "title", "content"):
+            documents.append(post_document(obj.id, obj.title, obj.content))
+        elif isinstance(obj, comment_model.Comment) and _changed(obj, "text", "post_id"):
+            documents.append(comment_document(obj.id, obj.post_id, obj.text))
+    for obj in session.deleted:
+        if isinstance(obj, post_model.Post):
+            removed.append(("post", obj.id))
+        elif isinstance(obj, comment_model.Comment):
+            removed.append(("comment", obj.id))
+    if documents or removed:
+        write_documents(session.connection(), documents, removed)
+
+def rebuild_search_documents(conn) -> int:
+    """ 由 posts / comments 重建所有文件 (以 keyset 分批讀取)，回傳文件數 """
+    conn.execute(delete(_documents))
+    sources = (
+        (post_model.Post, (post_model.Post.id, post_model.Post.title, post_model.Post.content), post_document),
+        (comment_model.Comment, (comment_model.Comment.id, comment_model.Comment.post_id, comment_model.Comment.text),
+         comment_document),
+    )
+    total = 0
+    for model, columns, build in sources:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(*columns).where(model.id > last_id).order_by(model.id).limit(SEARCH_REBUILD_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            write_documents(conn, [build(*row) for row in rows])
+            last_id = rows[-1][0]
+            total += len(rows)
+    return total
+
+def ensure_search_index(bind=engine, rebuild: bool = False):
+    """
+    建立 create_all() 不會處理的索引結構 (tsvector 欄位 + GIN / FTS5 + 觸發器)；
+    既有資料庫第一次建立時 (已有文章但沒有搜尋文件) 或 rebuild=True (斷詞方式改變) 時由 posts / comments 重建文件。
+    """
+    dialect = bind.dialect.name
+    with bind.begin() as conn:
+        if dialect == "postgresql":
+            for statement in _PG_DDL:
+                conn.execute(text(statement))
+        elif dialect == "sqlite":
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+        else:
+            print(f"⚠️ 全文檢索不支援 {dialect}，略過建立索引")
+            return
+
+        has_documents = conn.execute(select(_documents.c.id).limit(1)).first() is not None
+        has_posts = conn.execute(select(post_model.Post.id).limit(1)).first() is not None
+        if has_posts and (rebuild or not has_documents):
+            print("db.search: 建立搜尋文件...")
+            print(f"db.search: 已建立 {rebuild_search_documents(conn)} 筆搜尋文件")
+
+# --- 查詢 ---
+
+def parse_query(query: str) -> list:
+    """ 以空白分隔的每個詞斷成 token 串列；沒有可搜尋內容的詞 (例如只有標點) 略過 """
+    return [tokens for tokens in (tokenize(word) for word in query.split()) if tokens]
+
+def _tsquery(terms: list) -> str:
+    # 單一漢字就是一個 token，直接比對文件中的單字 token (見 search_tokens)
+    return " & ".join("(" + " <-> ".join(tokens) + ")" for tokens in terms)
+
+def _fts5_query(terms: list) -> str:
+    return " AND ".join('"' + " ".join(tokens) + '"' for tokens in terms)
+
+def encode_cursor(score: float, doc_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{score!r}:{doc_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """ 游標格式錯誤時丟出 ValueError """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, doc_id = raw.split(":")
+        return float(score), int(doc_id)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+def highlight_pattern(query: str):
+    """ 查詢中的漢字段/英數字段；英數字只比對整個詞，避免把 fa 標在 fans 裡 """
+    parts = []
+    for run in sorted(set(token_runs(query)), key=len, reverse=True):
+        escaped = re.escape(run)
+        parts.append(rf"(?<![a-z0-9]){escaped}(?![a-z0-9])" if run.isascii() else escaped)
+    return re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+def snippet(body: str, pattern, size: int = SEARCH_SNIPPET_CHARS) -> str:
+    """ 擷取第一個符合處附近的文字，跳脫 HTML 後以 <mark> 標示符合的詞 """
+    body = body.replace("\n", " ")
+    match = pattern.search(body) if pattern else None
+    start = max(match.start() - size // 4, 0) if match else 0
+    end = min(start + size, len(body))
+    window = body[start:end]
+    parts = []
+    position = 0
+    for found in (pattern.finditer(window) if pattern else ()):
+        parts.append(html.escape(window[position:found.start()]))
+        parts.append(f"<mark>{html.escape(found.group())}</mark>")
+        position = found.end()
+    parts.append(html.escape(window[position:]))
+    return ("…" if start else "") + "".join(parts) + ("…" if end < len(body) else "")
+
+def search(db: Session, query: str, after: tuple = None, limit: int = SEARCH_PAGE_SIZE) -> dict:
+    """
+    依相關度排序的搜尋結果 (對應 schemas/search.py 的 SearchPage)。
+    after 為上一頁最後一筆的 (score, id)，由 decode_cursor() 解析 next_cursor 而來。
+    """
+    terms = parse_query(query)
+    if not terms:
+        return {"items": [], "next_cursor": None}
+
+    dialect = db.get_bind().dialect.name
+    sql, after_clause = _SEARCH_SQL[dialect]
+    params = {"limit": limit + 1}
+    if dialect == "postgresql":
+        params["query"] = _tsquery(terms)
+    else:
+        params.update(query=_fts5_query(terms), title_weight=SEARCH_TITLE_WEIGHT)
+    if after is not None:
+        params.update(score=after[0], id=after[1])
+    ranked = db.execute(text(sql.format(after=after_clause if after else "")), params).all()
+    page = ranked[:limit]
+    if not page:
+        return {"items": [], "next_cursor": None}
+
+    # 只為這一頁取回摘要所需的內容與文章資訊
+    details = {
+        row.id: row
+        for row in db.execute(
+            select(_documents.c.id, _documents.c.kind, _documents.c.ref_id, _documents.c.body,
+                   post_model.Post.slug, post_model.Post.title)
+            .join(post_model.Post, post_model.Post.id == _documents.c.post_id)
+            .where(_documents.c.id.in_([row.id for row in page]))
+        )
+    }
+    pattern = highlight_pattern(query)
+    items = []
+    for row in page:
+        doc = details.get(row.id)
+        if doc is None:
+            continue
+        items.append({
+            "kind": doc.kind, "slug": doc.slug, "title": doc.title,
+            "comment_id": doc.ref_id if doc.kind == "comment" else None,
+            "snippet": snippet(doc.body, pattern), "score": float(row.score),
+        })
+    next_cursor = encode_cursor(page[-1].score, page[-1].id) if len(ranked) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def main():
+    ensure_search_index()
+    with engine.begin() as conn:
+        total = rebuild_search_documents(conn)
+    print(f"db.search: 已重建 {total} 筆搜尋文件。")
+
+if __name__ == "__main__":
+    main()
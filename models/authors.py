@@ -7,7 +7,8 @@ class Author(Base):
     __tablename__ = "authors"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False)
+    uid = Column(String, unique=True, index=True, nullable=True) # Firebase uid，初始資料的作者沒有 uid
+    name = Column(String, index=True, nullable=False) # 顯示名稱，不同使用者可能同名
     profilePic = Column(String, nullable=True) # 允許頭像 URL 為空
 
     # 建立與 Post, Comment, Like 的物件關聯
@@ -2,6 +2,7 @@
 from sqlalchemy import Column, Integer, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from db.engine import Base
+from models.timestamps import updated_at_column
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -11,6 +12,7 @@ class Comment(Base):
     
     post_id = Column(Integer, ForeignKey("posts.id"))
     author_id = Column(Integer, ForeignKey("authors.id"))
+    updated_at = updated_at_column()
 
     post = relationship("Post", back_populates="comments")
     author = relationship("Author", back_populates="comments")
\ No newline at end of file
@@ -1,14 +1,18 @@
 # models/likes.py
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db.engine import Base
+from models.timestamps import updated_at_column
 
 class Like(Base):
     __tablename__ = "likes"
+    # 同一位作者對同一篇文章只能按讚一次 (按讚 API 依賴此約束做 ON CONFLICT)
+    __table_args__ = (UniqueConstraint("post_id", "author_id", name="uq_likes_post_author"),)
 
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id"))
     author_id = Column(Integer, ForeignKey("authors.id"))
+    updated_at = updated_at_column()
 
     post = relationship("Post", back_populates="likes")
     author = relationship("Author", back_populates="likes")
\ No newline at end of file
@@ -2,6 +2,7 @@
 from sqlalchemy import Column, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from db.engine import Base
+from models.timestamps import updated_at_column
 
 class Post(Base):
     __tablename__ = "posts"
@@ -10,6 +11,11 @@ class Post(Base):
     slug = Column(String, unique=True, index=True, nullable=False)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
+
+    # 反正規化計數器，與按讚/留言在同一個交易中更新，可用 db/counters.py 重建
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = updated_at_column()
     
     author_id = Column(Integer, ForeignKey("authors.id")) # 外鍵，關聯到 authors 表格的 id
 
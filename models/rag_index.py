@@ -0,0 +1,18 @@
+# models/rag_index.py
+from sqlalchemy import Column, Integer, String, Text
+from db.engine import Base
+
+class RagIndexState(Base):
+    """ 部落格內容索引的進度 (high-water mark)，例如 name="comments" 記錄已索引到的最大留言 id """
+    __tablename__ = "rag_index_state"
+
+    name = Column(String, primary_key=True)
+    high_water = Column(Integer, nullable=False, default=0)
+
+class RagIndexedPost(Base):
+    """ 已寫入向量庫的文章：內容雜湊用來判斷是否需要重新索引，vector_ids 為 JSON 陣列 (更新/刪除時移除舊向量) """
+    __tablename__ = "rag_indexed_posts"
+
+    post_id = Column(Integer, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    vector_ids = Column(Text, nullable=False, default="[]")
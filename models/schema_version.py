@@ -0,0 +1,10 @@
+# models/schema_version.py
+from sqlalchemy import Column, Integer
+from db.engine import Base
+
+class SchemaVersion(Base):
+    """ 單列的結構/初始資料版本標記 (id 固定為 1)，啟動時只需一次主鍵查詢即可判斷是否需要 migration """
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
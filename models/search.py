@@ -0,0 +1,20 @@
+# models/search.py
+from sqlalchemy import Column, Integer, String, Text, UniqueConstraint
+from db.engine import Base
+
+class SearchDocument(Base):
+    """
+    全文檢索的文件 (一篇文章或一則留言)，由 db/search.py 在寫入文章/留言的同一個 flush 中維護。
+    *_tokens 為斷詞後以空白分隔的詞 (rag/text.py)；真正的索引依資料庫另外建立：
+    PostgreSQL 為產生欄位 tsv (tsvector) + GIN 索引，SQLite 為 FTS5 虛擬表 search_fts + 觸發器。
+    """
+    __tablename__ = "search_documents"
+    __table_args__ = (UniqueConstraint("kind", "ref_id", name="uq_search_documents_ref"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)         # "post" 或 "comment"
+    ref_id = Column(Integer, nullable=False)      # posts.id 或 comments.id
+    post_id = Column(Integer, nullable=False, index=True)
+    body = Column(Text, nullable=False, default="")  # 去除 HTML 的純文字，產生摘要用
+    title_tokens = Column(Text, nullable=False, default="")
+    body_tokens = Column(Text, nullable=False, default="")
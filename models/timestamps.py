@@ -0,0 +1,13 @@
+# models/timestamps.py
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, func
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def updated_at_column():
+    """
+    新增或修改時自動更新的時間戳，HTTP 快取的 ETag / Last-Modified 以它作為版本。
+    onupdate 對 Core 的 update() 也有效，所以 bump_post_counter_stmt 增減計數器時文章的 updated_at 會一起更新。
+    """
+    return Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow, server_default=func.now())
@@ -0,0 +1,140 @@
+# rag/answer_cache.py
+# 放在 get_answer 前面的答案快取：先比對正規化後的問題 (exact)，
+# 沒命中再以問題 embedding 的 cosine 相似度比對 (semantic)。
+# 快取 key 帶有知識庫版本，重新 ingest 後舊答案自動失效。
+import os
+import re
+import unicodedata
+
+from cache.lru import LRUCache
+from rag.corpus import corpus_version
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# 問題 embedding 的 cosine 相似度達到此門檻才視為同一個問題
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+
+_PUNCTUATION = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_question(question: str) -> str:
+    """ 全形轉半形、轉小寫、去除空白與標點 """
+    text = unicodedata.normalize("NFKC", question).lower()
+    return _PUNCTUATION.sub("", text)
+
+
+class AnswerCacheBackend:
+    """
+    快取儲存介面。目前只有行程內實作；之後要讓多個 worker 共用時，
+    實作同樣的四個方法 (例如以 Redis 儲存) 並在 BACKENDS 註冊即可。
+    entry 為 dict: {"answer": str, "vector": list[float] | None}
+    """
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, entry: dict):
+        raise NotImplementedError
+
+    def entries(self) -> list:
+        """ 回傳所有未過期的 (key, entry) """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBackend(AnswerCacheBackend):
+    """ 行程內 LRU + TTL """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self._lru = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str):
+        return self._lru.get(key)
+
+    def set(self, key: str, entry: dict):
+        self._lru.set(key, entry)
+
+    def entries(self) -> list:
+        return self._lru.items()
+
+    def clear(self):
+        self._lru.invalidate()
+
+    def stats(self) -> dict:
+        return self._lru.stats()
+
+
+BACKENDS = {
+    "memory": InMemoryBackend,
+}
+
+
+class AnswerCache:
+
+    def __init__(self, backend: AnswerCacheBackend, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.backend = backend
+        self.threshold = threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._version = None
+
+    def _key(self, question: str) -> str:
+        version = corpus_version()
+        if version != self._version:
+            # 知識庫已重新 ingest：清掉舊版本的答案
+            if self._version is not None:
+                self.backend.clear()
+            self._version = version
+        return f"{version}:{normalize_question(question)}"
+
+    def get_exact(self, question: str):
+        entry = self.backend.get(self._key(question))
+        if entry is not None:
+            self.exact_hits += 1
+            return entry["answer"]
+        return None
+
+    def get_semantic(self, vector):
+        """ 以 cosine 相似度找最接近的已快取問題，超過門檻才回傳答案 """
+        import numpy as np
+
+        prefix = f"{self._version}:"
+        candidates = [entry for key, entry in self.backend.entries()
+                      if key.startswith(prefix) and entry.get("vector") is not None]
+        if candidates:
+            matrix = np.asarray([entry["vector"] for entry in candidates], dtype=np.float32)
+            query = np.asarray(vector, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+            scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self.semantic_hits += 1
+                return candidates[best]["answer"]
+        self.misses += 1
+        return None
+
+    def set(self, question: str, answer: str, vector=None):
+        entry = {"answer": answer, "vector": list(vector) if vector is not None else None}
+        self.backend.set(self._key(question), entry)
+
+    def stats(self) -> dict:
+        stats = {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "threshold": self.threshold,
+            "corpus_version": self._version,
+        }
+        stats.update({f"backend_{k}": v for k, v in self.backend.stats().items()})
+        return stats
+
+
+answer_cache = AnswerCache(BACKENDS[ANSWER_CACHE_BACKEND]()) if ANSWER_CACHE_ENABLED else None
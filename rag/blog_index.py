@@ -0,0 +1,213 @@
+# rag/blog_index.py
+# 把部落格文章與留言寫入向量庫，讓小幫手也能回答文章相關的問題。
+# 只處理上次之後的變動：
+#   留言：只增不改，以 id 作為 high-water mark (rag_index_state)，只索引 id 更大的留言；
+#         id 在 commit 前就分配，晚 commit 的留言 id 可能小於 mark，因此每次往回重掃 BLOG_INDEX_RESCAN_WINDOW 筆
+#   文章：以內容雜湊比對 (rag_indexed_posts)，新增或內容改變的文章才重新切塊寫入，並刪除舊的向量
+# 使用方式: python -m rag.blog_index [--full]
+# 文章/留言與語料共用 Pinecone 的預設 namespace (檢索一次查到全部)；rag/ingest.py --full 清空 index 時
+# 會一併呼叫 reset_blog_index() 清掉這裡的進度，之後再全部重新寫入。
+# 新增留言後也會以 background task 呼叫 schedule_blog_index() (BLOG_INDEX_ON_COMMENT)，只處理新留言：
+# 文章比對需要讀出全部文章內容，成本隨文章數成長，交給 CLI (文章只在部署/後台更新時變動)。
+import argparse
+import json
+import os
+import threading
+
+from sqlalchemy import delete, select
+
+from db.engine import SessionLocal
+from models import comments as comment_model, posts as post_model
+from models.rag_index import RagIndexedPost, RagIndexState
+from rag.engine import RAG_VECTOR_BACKEND
+from rag.manifest import content_id
+from rag.pipeline import CHUNK_OVERLAP, CHUNK_SIZE, chunk_text, with_backoff
+from rag.text import strip_html
+
+BLOG_INDEX_BATCH_SIZE = int(os.getenv("BLOG_INDEX_BATCH_SIZE", "100"))
+# 每次從 high-water mark 往回重掃的留言 id 數 (upsert 以 id 為 key，重寫不會重複；embedding 來自快取)
+BLOG_INDEX_RESCAN_WINDOW = int(os.getenv("BLOG_INDEX_RESCAN_WINDOW", "50"))
+# 新增留言後是否在背景更新索引 (預設：有設定 Pinecone 且向量庫不是 local 時開啟)
+BLOG_INDEX_ON_COMMENT = os.getenv(
+    "BLOG_INDEX_ON_COMMENT", "1" if os.getenv("PINECONE_INDEX_NAME") and RAG_VECTOR_BACKEND != "local" else "0"
+).lower() in ("1", "true", "yes")
+
+
+def post_chunks(title: str, content: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list:
+    """ 段落依序併入不超過 size 的塊 (過長的段落再切)，每塊前面加上標題讓檢索結果有上下文 """
+    prefix = f"《{title}》"
+    budget = max(size - len(prefix), size // 2)
+    chunks = []
+    current = ""
+    for paragraph in strip_html(content).split("\n"):
+        if current and len(current) + 1 + len(paragraph) > budget:
+            chunks.append(current)
+            current = ""
+        if len(paragraph) > budget:
+            chunks.extend(chunk_text(paragraph, budget, overlap))
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return [prefix + chunk for chunk in chunks]
+
+
+def open_vectorstore():
+    """
+    文章/留言只寫入 Pinecone；本地索引為唯讀 (由 rag/ingest.py 整個重建)，
+    RAG_VECTOR_BACKEND=local 時服務只讀本地索引，寫進 Pinecone 也查不到，因此不索引。
+    """
+    if RAG_VECTOR_BACKEND == "local":
+        print("⚠️ RAG_VECTOR_BACKEND=local：本地索引不支援增量寫入，略過部落格內容索引 (請改用 Pinecone)。")
+        return None
+    index_name = os.getenv("PINECONE_INDEX_NAME")
+    if not index_name:
+        print("⚠️ 未設定 PINECONE_INDEX_NAME，略過部落格內容索引。")
+        return None
+    from langchain_pinecone import PineconeVectorStore
+    from rag.embedding_cache import cached_embeddings
+
+    return PineconeVectorStore(index_name=index_name, embedding=cached_embeddings())
+
+
+def _upsert(vectorstore, texts: list, ids: list, metadatas: list):
+    for start in range(0, len(texts), BLOG_INDEX_BATCH_SIZE):
+        end = start + BLOG_INDEX_BATCH_SIZE
+        with_backoff(vectorstore.add_texts, texts[start:end], metadatas=metadatas[start:end], ids=ids[start:end])
+
+
+def index_posts(db, vectorstore, full: bool = False) -> tuple:
+    """ 新增/修改的文章重新切塊寫入，已刪除的文章移除向量。回傳 (更新篇數, 移除篇數) """
+    indexed = {
+        row.post_id: row
+        for row in db.execute(select(RagIndexedPost.post_id, RagIndexedPost.content_hash, RagIndexedPost.vector_ids))
+    }
+    posts = db.execute(
+        select(post_model.Post.id, post_model.Post.slug, post_model.Post.title, post_model.Post.content)
+    ).all()
+
+    updated = 0
+    for post in posts:
+        content_hash = content_id(f"{post.title}\n{post.content}")
+        row = indexed.pop(post.id, None)
+        if row is not None and row.content_hash == content_hash and not full:
+            continue
+        chunks = post_chunks(post.title, post.content)
+        ids = [content_id(f"post:{post.id}:{chunk}") for chunk in chunks]
+        metadatas = [
+            {"source": f"post:{post.id}", "slug": post.slug, "title": post.title, "chunk": i, "content_id": vector_id}
+            for i, (vector_id, chunk) in enumerate(zip(ids, chunks))
+        ]
+        _upsert(vectorstore, chunks, ids, metadatas)
+        if row is not None:
+            stale = sorted(set(json.loads(row.vector_ids)) - set(ids))
+            if stale:
+                with_backoff(vectorstore.delete, ids=stale)
+        db.merge(RagIndexedPost(post_id=post.id, content_hash=content_hash, vector_ids=json.dumps(ids)))
+        db.commit()
+        updated += 1
+
+    # 剩下的是資料庫裡已不存在的文章
+    for row in indexed.values():
+        with_backoff(vectorstore.delete, ids=json.loads(row.vector_ids))
+        db.execute(delete(RagIndexedPost).where(RagIndexedPost.post_id == row.post_id))
+        db.commit()
+    return updated, len(indexed)
+
+
+def index_comments(db, vectorstore, full: bool = False) -> int:
+    """
+    索引 id 大於 high-water mark - BLOG_INDEX_RESCAN_WINDOW 的留言 (補上晚 commit 的留言)，
+    每批完成後推進 high-water mark。回傳寫入筆數
+    """
+    state = db.get(RagIndexState, "comments")
+    high_water = 0 if full or state is None else state.high_water
+    cursor = max(high_water - BLOG_INDEX_RESCAN_WINDOW, 0)
+    total = 0
+    while True:
+        # 以 keyset 分批讀取，每批寫入後就推進 high-water mark (中斷後從這裡繼續)
+        batch = db.execute(
+            select(comment_model.Comment.id, comment_model.Comment.text, post_model.Post.slug, post_model.Post.title)
+            .join(post_model.Post, post_model.Post.id == comment_model.Comment.post_id)
+            .where(comment_model.Comment.id > cursor)
+            .order_by(comment_model.Comment.id)
+            .limit(BLOG_INDEX_BATCH_SIZE)
+        ).all()
+        if not batch:
+            return total
+        texts = [f"《{row.title}》的留言：{row.text}" for row in batch]
+        ids = [content_id(f"comment:{row.id}") for row in batch]
+        metadatas = [
+            {"source": f"comment:{row.id}", "slug": row.slug, "title": row.title, "content_id": vector_id}
+            for row, vector_id in zip(batch, ids)
+        ]
+        _upsert(vectorstore, texts, ids, metadatas)
+        cursor = batch[-1].id
+        high_water = max(high_water, cursor)  # 重掃窗口內的留言不會讓 mark 倒退
+        db.merge(RagIndexState(name="comments", high_water=high_water))
+        db.commit()
+        total += len(batch)
+
+
+def reset_blog_index():
+    """ 向量庫被整個清空後 (rag/ingest.py --full) 清掉索引進度，下次 index_blog() 會全部重新寫入 """
+    db = SessionLocal()
+    try:
+        db.execute(delete(RagIndexState))
+        db.execute(delete(RagIndexedPost))
+        db.commit()
+    finally:
+        db.close()
+
+
+def index_blog(full: bool = False, include_posts: bool = True) -> dict:
+    """ include_posts=False 時只索引新留言 (新增留言後的背景工作) """
+    vectorstore = open_vectorstore()
+    if vectorstore is None:
+        return {"posts": 0, "removed_posts": 0, "comments": 0}
+    db = SessionLocal()
+    try:
+        updated, removed = index_posts(db, vectorstore, full=full) if include_posts else (0, 0)
+        comments = index_comments(db, vectorstore, full=full)
+    finally:
+        db.close()
+    result = {"posts": updated, "removed_posts": removed, "comments": comments}
+    if any(result.values()):
+        print(f"rag.blog_index: 文章更新 {updated} 篇、移除 {removed} 篇、寫入留言 {comments} 則 (含重掃)")
+    return result
+
+
+_run_lock = threading.Lock()
+_pending = threading.Event()
+
+
+def schedule_blog_index():
+    """
+    給 BackgroundTasks 呼叫 (新增留言後)，只索引新留言；同一時間只跑一個索引工作；
+    執行中又有新留言時只做記號，目前這輪結束後再跑一次 (不會漏掉，也不會同時重複寫入)。
+    """
+    _pending.set()
+    while _pending.is_set():
+        if not _run_lock.acquire(blocking=False):
+            return
+        try:
+            while _pending.is_set():
+                _pending.clear()
+                try:
+                    index_blog(include_posts=False)
+                except Exception as e:
+                    print(f"❌ 部落格內容索引失敗: {e}")
+        finally:
+            _run_lock.release()
+        # 釋放鎖之前剛好有新留言進來時，記號還在，由這裡再跑一輪
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將部落格文章與留言寫入向量庫 (只處理上次之後的變動)")
+    parser.add_argument("--full", action="store_true", help="忽略進度，全部重新寫入")
+    args = parser.parse_args()
+    print(index_blog(full=args.full))
+
+
+if __name__ == "__main__":
+    main()
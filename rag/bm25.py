@@ -0,0 +1,101 @@
+# rag/bm25.py
+# 關鍵字 (BM25) 檢索與 RRF 融合。
+# 斷詞見 rag/text.py：漢字以 bigram、英數字以整段 (轉小寫) 作為詞，
+# 因此「FA」、「WBC」、球員姓名這類專有名詞能直接比對到，補足向量檢索。
+import numpy as np
+
+from rag.text import tokenize
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# RRF 的平滑常數 (Cormack et al. 建議值)
+RRF_K = 60
+
+
+class BM25Index:
+    """
+    以 CSR 形式保存的倒排索引：每個詞在 offsets 中有一段區間，
+    對應 doc_ids (int32) 與 tfs (float32) 兩個連續陣列；查詢時只碰到 query 裡的詞。
+    """
+
+    def __init__(self, texts: list, k1: float = BM25_K1, b: float = BM25_B):
+        self.texts = list(texts)
+        self.k1 = k1
+        self.b = b
+
+        postings = {}
+        lengths = np.zeros(len(self.texts), dtype=np.float32)
+        for doc_id, text in enumerate(self.texts):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        self.vocab = {}
+        offsets = [0]
+        doc_ids = []
+        tfs = []
+        for term_id, (token, plist) in enumerate(postings.items()):
+            self.vocab[token] = term_id
+            doc_ids.extend(doc_id for doc_id, _ in plist)
+            tfs.extend(tf for _, tf in plist)
+            offsets.append(len(doc_ids))
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.tfs = np.asarray(tfs, dtype=np.float32)
+
+        n = len(self.texts)
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(lengths.mean()) if n else 0.0
+        # 每篇文件的長度正規化項 k1 * (1 - b + b * dl / avgdl)，建索引時先算好
+        self.norms = (k1 * (1 - b + b * lengths / avgdl)).astype(np.float32) if avgdl else lengths
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.norms[docs])
+        return scores
+
+    def search(self, query: str, k: int) -> list:
+        """ 回傳 [(doc_id, score)]，只包含分數大於 0 的文件 """
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores > 0)
+        if hits.size == 0:
+            return []
+        if hits.size > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int, rrf_k: int = RRF_K) -> list:
+    """
+    rankings: 多個依相關度排序的 key 列表；回傳融合後的前 k 個 key。
+    每個 key 的分數為 Σ 1 / (rrf_k + 名次)，只看名次，不需要校正各檢索器的分數尺度。
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
+
+
+def load_corpus_chunks(path: str) -> list:
+    """
+    與 rag/ingest.py 寫入向量庫的文件完全相同 (rag/pipeline.py 的 iter_chunks：每個非空行，過長的再切塊)，
+    RRF 以內容比對兩邊的結果，切法不同就對不起來。
+    """
+    from rag.pipeline import iter_chunks
+
+    return [chunk for _, _, _, chunk in iter_chunks([path])]
+
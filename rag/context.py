@@ -0,0 +1,157 @@
+# rag/context.py
+# 組裝 prompt 的 {context}：去除重複 → MMR 重新排序 → 在 token 預算內貪婪裝入。
+# data.txt 有不少幾乎相同的句子 (例如「球員異動」與「球員資料」描述同一件事)，
+# 原本 20 行全部塞進 prompt；這裡只留彼此不重複、又最相關的幾行。
+import os
+import re
+import threading
+
+from rag.text import tokenize
+
+# {context} 的 token 上限 (不含 system prompt 本身)
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+# MMR 的 λ：越大越重視相關度，越小越重視多樣性
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# 兩行 bigram 集合的 Jaccard 相似度達到此值視為近似重複
+RAG_NEAR_DUPLICATE = float(os.getenv("RAG_NEAR_DUPLICATE", "0.8"))
+RAG_TOKENIZER = os.getenv("RAG_TOKENIZER", "o200k_base")  # gpt-4o 系列
+
+_WHITESPACE = re.compile(r"\s+")
+_CJK = re.compile(r"[㐀-鿿豈-﫿　-〿＀-￯]")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def load_encoding():
+    """
+    載入 tiktoken 的詞表 (第一次可能需要從網路下載)，由 init_rag_chain() 在 event loop 之外呼叫；
+    失敗 (沒安裝、離線) 時保持 None，count_tokens 改用估計值。
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(RAG_TOKENIZER)
+            except Exception as e:
+                print(f"⚠️ 無法載入 tiktoken ({e.__class__.__name__})，改用估計的 token 數")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    以 tiktoken 計算 token 數；詞表尚未載入 (見 load_encoding) 或無法使用時改用估計值：
+    每個中文字/全形符號約 1 token，其餘約 4 個字元 1 token。這裡不會載入詞表，不會在 event loop 上阻塞。
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe(texts: list, threshold: float = RAG_NEAR_DUPLICATE) -> list:
+    """ 依原本順序保留第一次出現的內容；完全相同 (忽略空白) 或 bigram 高度重疊的後者會被移除 """
+    kept = []
+    seen = set()
+    kept_tokens = []
+    for text in texts:
+        key = _WHITESPACE.sub("", text)
+        if not key or key in seen:
+            continue
+        tokens = set(tokenize(text))
+        if any(_jaccard(tokens, other) >= threshold for other in kept_tokens):
+            continue
+        seen.add(key)
+        kept.append(text)
+        kept_tokens.append(tokens)
+    return kept
+
+
+def mmr(texts: list, lambda_: float = RAG_MMR_LAMBDA) -> list:
+    """
+    Maximal Marginal Relevance。相關度取檢索結果的名次 (第 1 名為 1，線性遞減)，
+    相似度取 bigram Jaccard：不需要額外的 embedding 呼叫。
+    """
+    n = len(texts)
+    if n <= 2:
+        return list(texts)
+    relevance = [1.0 - i / n for i in range(n)]
+    tokens = [set(tokenize(text)) for text in texts]
+    selected = []
+    remaining = list(range(n))
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda i: lambda_ * relevance[i]
+            - (1 - lambda_) * max((_jaccard(tokens[i], tokens[j]) for j in selected), default=0.0),
+        )
+        selected.append(best)
+        remaining.remove(best)
+    return [texts[i] for i in selected]
+
+
+class ContextStats:
+    """ 累計 context 組裝前後的 token 數，用來追蹤省下的 prompt 大小 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.docs_in = 0
+        self.docs_out = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def record(self, docs_in: int, docs_out: int, tokens_in: int, tokens_out: int):
+        with self._lock:
+            self.requests += 1
+            self.docs_in += docs_in
+            self.docs_out += docs_out
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "token_budget": RAG_CONTEXT_TOKENS,
+                "docs_in": self.docs_in,
+                "docs_out": self.docs_out,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "avg_tokens_out": round(self.tokens_out / self.requests, 1) if self.requests else 0.0,
+                "saved_ratio": round(1 - self.tokens_out / self.tokens_in, 4) if self.tokens_in else 0.0,
+            }
+
+
+context_stats = ContextStats()
+
+
+def pack_context(docs, budget: int = RAG_CONTEXT_TOKENS, separator: str = "\n\n") -> str:
+    """
+    docs 依相關度排序 (Document 或字串)。回傳去重、MMR 排序後在 budget 內的 context 字串。
+    放不下的行會跳過，繼續嘗試後面較短的行。
+    """
+    texts = [getattr(doc, "page_content", doc) for doc in docs]
+    tokens_in = count_tokens(separator.join(texts))
+
+    separator_tokens = count_tokens(separator)
+    packed = []
+    used = 0
+    for text in mmr(dedupe(texts)):
+        cost = count_tokens(text) + (separator_tokens if packed else 0)
+        if used + cost > budget:
+            continue
+        packed.append(text)
+        used += cost
+
+    context = separator.join(packed)
+    context_stats.record(len(texts), len(packed), tokens_in, count_tokens(context))
+    return context
@@ -0,0 +1,52 @@
+# rag/corpus.py
+# 知識庫 (data.txt) 的版本：rag/ingest.py 上傳成功後寫入版本檔，
+# 執行中的服務依此判斷索引內容是否已更新 (例如讓答案快取失效)
+import hashlib
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ROOT_DIR, "data.txt")
+# 與 embedding 快取、ingest manifest 一樣放在 .cache/ (不納入版本控制)
+CORPUS_VERSION_FILE = os.getenv("RAG_CORPUS_VERSION_FILE", os.path.join(ROOT_DIR, ".cache", "data.version"))
+
+_cached = {"mtime": None, "version": None}
+
+
+def compute_corpus_version(path: str = DATA_FILE) -> str:
+    """ 以檔案內容的 SHA-256 (前 16 碼) 作為版本 """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def write_corpus_version(version: str):
+    os.makedirs(os.path.dirname(CORPUS_VERSION_FILE), exist_ok=True)
+    with open(CORPUS_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(version)
+
+
+def corpus_version() -> str:
+    """
+    目前索引的版本：RAG_CORPUS_VERSION 環境變數 > 版本檔 > data.txt 的雜湊。
+    版本檔只在 mtime 改變時重新讀取。
+    """
+    env_version = os.getenv("RAG_CORPUS_VERSION")
+    if env_version:
+        return env_version
+    try:
+        mtime = os.stat(CORPUS_VERSION_FILE).st_mtime
+    except OSError:
+        mtime = None
+    if mtime is not None and mtime == _cached["mtime"]:
+        return _cached["version"]
+    if mtime is not None:
+        with open(CORPUS_VERSION_FILE, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    elif _cached["version"] is None and os.path.exists(DATA_FILE):
+        version = compute_corpus_version()
+    else:
+        return _cached["version"] or ""
+    _cached.update(mtime=mtime, version=version)
+    return version
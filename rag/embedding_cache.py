@@ -0,0 +1,272 @@
+# rag/embedding_cache.py
+# 包在 OpenAIEmbeddings 外面的 embedding 快取，查詢 (retriever) 與 rag/ingest.py 共用。
+# key 為 SHA-256(模型名稱 + 文字)：
+#   記憶體層：LRU，同一個行程內重複的問題不需要任何 I/O
+#   磁碟層  ：每個模型一個只會附加 (append-only) 的紀錄檔，以 numpy.memmap 讀取，
+#             多個 worker / 重新部署之間共用，重新 ingest 沒變的行也不會再呼叫 API
+import hashlib
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只保證同一個行程內不交錯
+    fcntl = None
+
+from cache.lru import LRUCache
+from rag.corpus import ROOT_DIR
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "embeddings"))
+# 唯讀的檔案系統 (例如 Vercel) 可設為 0，只保留記憶體層
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "1").lower() in ("1", "true", "yes")
+
+# 紀錄檔格式：16 bytes 標頭 (magic + 維度)，之後每筆紀錄為 32 bytes 的 key + dim 個 float32
+_MAGIC = b"EMBCACHE"
+_HEADER_SIZE = 16
+
+
+def _write_all(fd: int, data: bytes):
+    """ os.write 可能只寫入一部分 (short write)，寫到整個 buffer 都寫完為止 """
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+class DiskEmbeddingStore:
+    """
+    以 memmap 讀取的 append-only 紀錄檔。
+    每批紀錄在檔案鎖 (flock) 內以 O_APPEND 寫完整個 buffer，多個行程同時寫入也不會交錯；
+    寫入前若檔尾有不完整的紀錄 (例如上次寫到一半就中斷) 先截掉，之後的紀錄才不會錯位。
+    讀取時只看完整的紀錄，檔案變大 (其他行程寫入) 時才重新 map。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dim = None
+        self._records = None
+        self._index = {}
+        self._rows = 0
+        self._mapped_size = 0
+
+    def _dtype(self, dim: int):
+        # key 用 uint8 陣列而不是 S32：numpy 的 bytes 型別會去掉結尾的 \x00
+        return np.dtype([("key", "u1", (32,)), ("vec", "<f4", (dim,))])
+
+    def _read_dim(self):
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(_HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        if len(header) < _HEADER_SIZE or not header.startswith(_MAGIC):
+            raise ValueError(f"{self.path} 不是 embedding 快取檔")
+        return int.from_bytes(header[len(_MAGIC):], "little")
+
+    def _refresh(self):
+        """ 檔案有新的紀錄時重新 map，並把新的 key 加入索引 """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size == self._mapped_size:
+            return
+        if self._dim is None:
+            self._dim = self._read_dim()
+            if self._dim is None:
+                return
+        dtype = self._dtype(self._dim)
+        count = (size - _HEADER_SIZE) // dtype.itemsize
+        if count <= 0:
+            return
+        records = np.memmap(self.path, dtype=dtype, mode="r", offset=_HEADER_SIZE, shape=(count,))
+        for row in range(self._rows, count):
+            self._index.setdefault(records["key"][row].tobytes(), row)
+        self._rows = count
+        self._records = records
+        self._mapped_size = size
+
+    def get(self, key: bytes):
+        with self._lock:
+            row = self._index.get(key)
+            if row is None:
+                self._refresh()
+                row = self._index.get(key)
+            if row is None:
+                return None
+            return self._records["vec"][row].tolist()
+
+    def _create(self, dim: int):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            # 其他行程剛好先建立了檔案
+            self._dim = self._read_dim()
+            return
+        try:
+            _write_all(fd, _MAGIC + dim.to_bytes(_HEADER_SIZE - len(_MAGIC), "little"))
+        finally:
+            os.close(fd)
+        self._dim = dim
+
+    def put_many(self, items):
+        """ items: [(key, vector)]；同一批紀錄以一次 write 附加 """
+        if not items:
+            return
+        with self._lock:
+            dim = len(items[0][1])
+            if self._dim is None:
+                self._dim = self._read_dim()
+            if self._dim is None:
+                self._create(dim)
+            if dim != self._dim:
+                raise ValueError(f"embedding 維度 {dim} 與快取檔 {self._dim} 不符")
+
+            records = np.zeros(len(items), dtype=self._dtype(dim))
+            for i, (key, vector) in enumerate(items):
+                records["key"][i] = np.frombuffer(key, dtype=np.uint8)
+                records["vec"][i] = vector
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                partial = (os.fstat(fd).st_size - _HEADER_SIZE) % records.dtype.itemsize
+                if partial:
+                    os.ftruncate(fd, os.fstat(fd).st_size - partial)
+                _write_all(fd, records.tobytes())
+            finally:
+                os.close(fd)  # 關閉時釋放 flock
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings 介面，先查記憶體層、再查磁碟層，都沒有才呼叫底層模型。
+    可以直接交給 PineconeVectorStore 使用。
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache_size: int = EMBEDDING_CACHE_SIZE,
+                 cache_dir: str = EMBEDDING_CACHE_DIR, use_disk: bool = EMBEDDING_CACHE_DISK):
+        self.embeddings = embeddings
+        self.model = model
+        self.memory = LRUCache(maxsize=cache_size, ttl=float("inf"))
+        self.disk = None
+        if use_disk:
+            safe_model = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+            self.disk = DiskEmbeddingStore(os.path.join(cache_dir, f"{safe_model}.bin"))
+        self.disk_hits = 0
+        self.embedded = 0
+
+    def _lookup(self, texts):
+        """ 回傳 (keys, vectors, 缺少的 index)；vectors 中缺少的位置為 None """
+        keys = [embedding_key(self.model, text) for text in texts]
+        vectors = []
+        missing = []
+        for i, key in enumerate(keys):
+            vector = self.memory.get(key)
+            if vector is None and self.disk is not None:
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self.disk_hits += 1
+                    self.memory.set(key, vector)
+            if vector is None:
+                missing.append(i)
+            vectors.append(vector)
+        return keys, vectors, missing
+
+    def _store(self, keys, vectors, missing, embedded):
+        new_items = {}
+        for i, vector in zip(missing, embedded):
+            vector = list(vector)
+            vectors[i] = vector
+            self.memory.set(keys[i], vector)
+            new_items[keys[i]] = vector
+        self.embedded += len(new_items)
+        if self.disk is not None and new_items:
+            try:
+                self.disk.put_many(list(new_items.items()))
+            except (OSError, ValueError) as e:
+                # 磁碟不可寫時退回只用記憶體層
+                print(f"⚠️ embedding 快取無法寫入磁碟，改為只用記憶體: {e}")
+                self.disk = None
+        return vectors
+
+    def _disk_get(self, key):
+        try:
+            return self.disk.get(key)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ embedding 快取檔讀取失敗，改為只用記憶體: {e}")
+            self.disk = None
+            return None
+
+    @staticmethod
+    def _unique(texts, missing):
+        # 同一批重複的文字只送一次
+        return list(dict.fromkeys(texts[i] for i in missing))
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            unique = self._unique(texts, missing)
+            result = dict(zip(unique, self.embeddings.embed_documents(unique)))
+            vectors = self._store(keys, vectors, missing, [result[texts[i]] for i in missing])
+        return vectors
+
+    async def aembed_documents(self, texts):
+        texts = list(texts)
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            unique = self._unique(texts, missing)
+            result = dict(zip(unique, await self.embeddings.aembed_documents(unique)))
+            vectors = self._store(keys, vectors, missing, [result[texts[i]] for i in missing])
+        return vectors
+
+    def embed_query(self, text):
+        keys, vectors, missing = self._lookup([text])
+        if missing:
+            vectors = self._store(keys, vectors, missing, [self.embeddings.embed_query(text)])
+        return vectors[0]
+
+    async def aembed_query(self, text):
+        keys, vectors, missing = self._lookup([text])
+        if missing:
+            vectors = self._store(keys, vectors, missing, [await self.embeddings.aembed_query(text)])
+        return vectors[0]
+
+    def stats(self) -> dict:
+        stats = {
+            "model": self.model,
+            "disk_hits": self.disk_hits,
+            "embedded": self.embedded,
+            "disk_path": self.disk.path if self.disk is not None else None,
+        }
+        stats.update({f"memory_{k}": v for k, v in self.memory.stats().items()})
+        return stats
+
+
+def cached_embeddings(model: str = EMBEDDING_MODEL) -> CachedEmbeddings:
+    """ EMBEDDING_MODEL=fake 時使用離線的 HashingEmbeddings (測試用)，否則為 OpenAI """
+    if model == "fake":
+        from rag.fake_embeddings import HashingEmbeddings
+
+        return CachedEmbeddings(HashingEmbeddings(), model=model, use_disk=False)
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return CachedEmbeddings(OpenAIEmbeddings(model=model), model=model)
@@ -1,12 +1,52 @@
+import asyncio
 import os
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_pinecone import PineconeVectorStore
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+import threading
+import time
+
+from cache.singleflight import AsyncSingleFlight
+from rag.answer_cache import answer_cache, normalize_question
+# LangChain / OpenAI / Pinecone 很重，只在 init_rag_chain() 內 import，
+# 只提供文章 API 或靜態檔案的實例不會載入它們
 
 # 全域變數
 rag_chain = None
+embeddings = None         # 問題的 embedding (答案快取的語意比對也會用到)
+retriever = None          # 檢索階段 (question -> docs)
+fallback_retriever = None # retriever 失敗時改用的本地索引
+generation_chain = None   # 生成階段 ({context, question} -> 回答)
+
+RAG_UNAVAILABLE_MESSAGE = "系統維護中，RAG 尚未初始化 (向量庫連線失敗)。"
+RAG_TIMEOUT_MESSAGE = "小幫手回應逾時，請稍後再試。"
+
+# 同時執行的 RAG 請求上限；滿載時等待 RAG_QUEUE_TIMEOUT 秒 (0 = 立即回覆忙線)
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "8"))
+RAG_QUEUE_TIMEOUT = float(os.getenv("RAG_QUEUE_TIMEOUT", "0"))
+# 檢索 (embedding + 向量搜尋) 與生成 (LLM) 各自的逾時 (秒)
+RAG_RETRIEVAL_TIMEOUT = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "5"))
+RAG_GENERATION_TIMEOUT = float(os.getenv("RAG_GENERATION_TIMEOUT", "30"))
+
+# 向量庫：pinecone (預設) 或 local (rag/local_index.py)；
+# 使用 Pinecone 時，若已建立本地索引則在 Pinecone 失敗/逾時時自動改用 (RAG_LOCAL_FALLBACK=0 關閉)
+RAG_VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "pinecone")
+RAG_LOCAL_FALLBACK = os.getenv("RAG_LOCAL_FALLBACK", "1").lower() in ("1", "true", "yes")
+# 向量檢索的筆數；啟用混合檢索 (RAG_HYBRID) 時與 BM25 結果以 RRF 融合，只留 RAG_HYBRID_K 筆
+RAG_VECTOR_K = int(os.getenv("RAG_VECTOR_K", "20"))
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1").lower() in ("1", "true", "yes")
+RAG_HYBRID_K = int(os.getenv("RAG_HYBRID_K", "8"))
+
+_rag_semaphore = asyncio.Semaphore(RAG_MAX_CONCURRENCY)
+
+# 同時間相同 (正規化後) 的問題只跑一次檢索 + 生成，其他請求等同一個結果 (只佔一個名額)
+answer_flight = AsyncSingleFlight()
+stream_flight = AsyncSingleFlight()
+
+class RagBusyError(Exception):
+    """ 同時進行的 RAG 請求已達上限 """
+
+# 延遲初始化：第一個聊天請求才連線 Pinecone；失敗後至少間隔這麼久才重試 (秒)
+RAG_INIT_RETRY_INTERVAL = 60
+_rag_init_lock = threading.Lock()
+_rag_init_attempted_at = None
 
 # 沿用您的 Prompt
 RAG_SYSTEM_PROMPT = """你是富邦悍將（Fubon Guardians）的熱血應援小幫手！你非常熟悉球隊的成員、教練與相關資訊。
@@ -21,41 +61,109 @@ RAG_SYSTEM_PROMPT = """你是富邦悍將（Fubon Guardians）的熱血應援小
 {context}
 """
 
-def init_rag_chain():
-    """初始化 RAG 系統 (連線 Pinecone)"""
-    global rag_chain
-    
+def format_docs(docs):
+    """ 去重、MMR 排序並限制在 RAG_CONTEXT_TOKENS 內 (rag/context.py) """
+    from rag.context import pack_context
+
+    return pack_context(docs)
+
+def build_local_retriever():
+    """ 載入本地向量索引 (rag/ingest.py 建立)；沒有索引或載入失敗回傳 None """
+    from rag.local_index import LocalVectorStore, local_index_exists
+
+    if not local_index_exists():
+        return None
+    try:
+        store = LocalVectorStore.load(embeddings, model=embeddings.model)
+    except Exception as e:
+        print(f"❌ 本地向量索引載入失敗: {e}")
+        return None
+    print(f"✅ 已載入本地向量索引 ({len(store.texts)} 筆)")
+    return store.as_retriever(search_kwargs={"k": RAG_VECTOR_K})
+
+def build_pinecone_retriever():
     index_name = os.getenv("PINECONE_INDEX_NAME")
     if not index_name:
-        print("❌ 警告：未設定 PINECONE_INDEX_NAME，RAG 功能將無法使用。")
-        return
+        print("❌ 警告：未設定 PINECONE_INDEX_NAME。")
+        return None
+    try:
+        from langchain_pinecone import PineconeVectorStore
+
+        # 連線 Pinecone (不需重新上傳，直接連線)
+        vectorstore = PineconeVectorStore(index_name=index_name, embedding=embeddings)
+    except Exception as e:
+        print(f"❌ Pinecone 連線失敗: {e}")
+        return None
+    print(f"✅ 已連線 Pinecone: {index_name}")
+    return vectorstore.as_retriever(search_kwargs={"k": RAG_VECTOR_K})
+
+def load_bm25_index():
+    """ 以 data.txt 建立 BM25 索引 (與 rag/ingest.py 相同的切塊)；沒有 data.txt 回傳 None """
+    from rag.bm25 import BM25Index, load_corpus_chunks
+    from rag.corpus import DATA_FILE
+
+    if not os.path.exists(DATA_FILE):
+        print(f"⚠️ 找不到 {DATA_FILE}，不使用關鍵字檢索")
+        return None
+    return BM25Index(load_corpus_chunks(DATA_FILE))
+
+def build_hybrid_retriever(vector_retriever, bm25):
+    from rag.hybrid import HybridRetriever
 
-    print(f"--- 正在初始化 RAG (Pinecone: {index_name}) ---")
+    return HybridRetriever(vector_retriever=vector_retriever, bm25=bm25, k=RAG_HYBRID_K, candidate_k=RAG_VECTOR_K)
+
+def init_rag_chain():
+    """初始化 RAG 系統 (依 RAG_VECTOR_BACKEND 連線 Pinecone 或載入本地索引)"""
+    global rag_chain, embeddings, retriever, fallback_retriever, generation_chain
+
+    print(f"--- 正在初始化 RAG (向量庫: {RAG_VECTOR_BACKEND}) ---")
     
     try:
-        # 1. 連線 Pinecone (不需重新上傳，直接連線)
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        vectorstore = PineconeVectorStore(index_name=index_name, embedding=embeddings)
-        
-        # 2. 定義 Retriever
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 20})
+        from langchain_openai import ChatOpenAI
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.runnables import RunnablePassthrough
+        from rag.embedding_cache import cached_embeddings
+
+        from rag.context import load_encoding
+
+        # 0. context 的 token 計數詞表 (首次可能要下載；init_rag_chain 由 ensure_rag_chain 在 threadpool 執行)
+        load_encoding()
+
+        # 1. 問題的 embedding 經過快取，重複的問題不再呼叫 API
+        embeddings = cached_embeddings()
 
-        # 3. 定義 LLM 與 Prompt
+        # 2. 定義 Retriever；Pinecone 為主時，本地索引 (若有) 作為備援
+        if RAG_VECTOR_BACKEND == "local":
+            retriever = build_local_retriever()
+        else:
+            retriever = build_pinecone_retriever()
+            fallback_retriever = build_local_retriever() if RAG_LOCAL_FALLBACK else None
+            if retriever is None and fallback_retriever is not None:
+                print("⚠️ Pinecone 無法使用，改用本地向量索引")
+                retriever, fallback_retriever = fallback_retriever, None
+        if retriever is None:
+            print("❌ 沒有可用的向量庫，RAG 功能將無法使用。")
+            return
+        # 3. 關鍵字 (BM25) 與向量檢索以 RRF 融合
+        bm25 = load_bm25_index() if RAG_HYBRID else None
+        if bm25 is not None:
+            retriever = build_hybrid_retriever(retriever, bm25)
+            if fallback_retriever is not None:
+                fallback_retriever = build_hybrid_retriever(fallback_retriever, bm25)
+
+        # 4. 定義 LLM 與 Prompt
         llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
         prompt = ChatPromptTemplate.from_messages([
             ("system", RAG_SYSTEM_PROMPT),
             ("user", "{question}")
         ])
 
-        # 4. 建立 Chain
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
-
+        # 5. 建立 Chain (檢索與生成分開保留，才能分別設定逾時)
+        generation_chain = prompt | llm | StrOutputParser()
         rag_chain = (
             {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
+            | generation_chain
         )
         
         print("✅ RAG 系統初始化完成")
@@ -63,13 +171,205 @@ def init_rag_chain():
     except Exception as e:
         print(f"❌ RAG 初始化失敗: {e}")
 
-def get_answer(question: str) -> str:
-    """提供給 API 呼叫的介面"""
-    if not rag_chain:
-        return "系統維護中，RAG 尚未初始化 (Pinecone 連線失敗)。"
-    
+def ensure_rag_chain():
+    """第一次需要 RAG 時才初始化 (多個請求同時進來只會初始化一次)"""
+    global _rag_init_attempted_at
+    if rag_chain:
+        return rag_chain
+    with _rag_init_lock:
+        now = time.monotonic()
+        if not rag_chain and (
+            _rag_init_attempted_at is None or now - _rag_init_attempted_at > RAG_INIT_RETRY_INTERVAL
+        ):
+            _rag_init_attempted_at = now
+            init_rag_chain()
+    return rag_chain
+
+class _RagSlot:
+    """
+    佔用一個 RAG 名額；release() 可重複呼叫。
+    交給串流的上游後 (owned) 由上游在結束時釋放，呼叫端只能用 release_unowned() 收回沒用到的名額。
+    """
+
+    def __init__(self):
+        self._released = False
+        self.owned = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            _rag_semaphore.release()
+
+    def release_unowned(self):
+        # 上游還在為其他訂閱者生成時不能釋放，否則同時執行的 LLM 請求會超過 RAG_MAX_CONCURRENCY
+        if not self.owned:
+            self.release()
+
+async def acquire_rag_slot() -> _RagSlot:
+    """ 取得 RAG 名額；滿載時立即 (或等待 RAG_QUEUE_TIMEOUT 後) 丟出 RagBusyError，不無限排隊 """
+    if RAG_QUEUE_TIMEOUT <= 0:
+        if _rag_semaphore.locked():
+            raise RagBusyError()
+        await _rag_semaphore.acquire()
+    else:
+        try:
+            await asyncio.wait_for(_rag_semaphore.acquire(), RAG_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RagBusyError()
+    return _RagSlot()
+
+async def retrieve_context(question: str) -> str:
+    """
+    檢索階段，超過 RAG_RETRIEVAL_TIMEOUT 會丟出 asyncio.TimeoutError (並取消檢索)。
+    有本地備援索引時，主要向量庫失敗或逾時會改查本地索引。
+    """
+    try:
+        docs = await asyncio.wait_for(retriever.ainvoke(question), RAG_RETRIEVAL_TIMEOUT)
+    except Exception as e:
+        if fallback_retriever is None:
+            raise
+        print(f"⚠️ 向量庫檢索失敗，改用本地索引: {e!r}")
+        docs = await asyncio.wait_for(fallback_retriever.ainvoke(question), RAG_RETRIEVAL_TIMEOUT)
+    return format_docs(docs)
+
+async def embed_question(question: str):
+    """ 問題的 embedding；失敗或逾時回傳 None (只影響語意快取，不影響回答) """
     try:
-        result = rag_chain.invoke(question)
-        return result
+        return await asyncio.wait_for(embeddings.aembed_query(question), RAG_RETRIEVAL_TIMEOUT)
     except Exception as e:
-        return f"發生錯誤: {str(e)}"
\ No newline at end of file
+        print(f"⚠️ 問題 embedding 失敗，略過語意快取: {e}")
+        return None
+
+def exact_cached_answer(question: str):
+    """ 查答案快取 (正規化後完全相同的問題)，不需要任何外部呼叫 """
+    if answer_cache is None:
+        return None
+    return answer_cache.get_exact(question)
+
+async def semantic_cached_answer(question: str):
+    """
+    以問題 embedding 查答案快取，回傳 (answer, vector)；answer 為 None 表示沒命中。
+    vector 留給之後寫入快取用。需在 ensure_rag_chain() 之後呼叫。
+    """
+    if answer_cache is None or embeddings is None:
+        return None, None
+    vector = await embed_question(question)
+    if vector is None:
+        return None, None
+    return answer_cache.get_semantic(vector), vector
+
+def remember_answer(question: str, answer: str, vector=None):
+    if answer_cache is not None:
+        answer_cache.set(question, answer, vector)
+
+async def get_answer(question: str) -> str:
+    """
+    提供給 API 呼叫的介面 (async)。
+    先查答案快取，命中時不佔用 RAG 名額；相同問題正在處理中時直接等待同一個結果。
+    滿載時丟出 RagBusyError (同時等待的請求也會收到)；各階段逾時或失敗時回傳說明文字 (不寫入快取)。
+    請求被取消 (例如使用者離線) 時，只有在沒有其他請求等待同一個問題時才取消檢索/LLM 呼叫。
+    """
+    answer = exact_cached_answer(question)
+    if answer is not None:
+        return answer
+    return await answer_flight.do(normalize_question(question), lambda: _compute_answer(question))
+
+async def _compute_answer(question: str) -> str:
+    # 初始化可能需要連線 Pinecone，放到 thread 避免卡住 event loop
+    if not await asyncio.to_thread(ensure_rag_chain):
+        return RAG_UNAVAILABLE_MESSAGE
+
+    answer, vector = await semantic_cached_answer(question)
+    if answer is not None:
+        return answer
+
+    slot = await acquire_rag_slot()
+    try:
+        context = await retrieve_context(question)
+        answer = await asyncio.wait_for(
+            generation_chain.ainvoke({"context": context, "question": question}),
+            RAG_GENERATION_TIMEOUT,
+        )
+        remember_answer(question, answer, vector)
+        return answer
+    except asyncio.TimeoutError:
+        return RAG_TIMEOUT_MESSAGE
+    except Exception as e:
+        return f"發生錯誤: {str(e)}"
+    finally:
+        slot.release()
+
+def answer_in_flight(question: str) -> bool:
+    """ 相同問題是否正在串流生成 (加入的請求不需要另外取得名額) """
+    return stream_flight.in_flight(normalize_question(question))
+
+async def stream_answer(question: str, slot: _RagSlot = None):
+    """
+    逐 token 產生回答 (async generator)，由 generation_chain.astream 驅動。
+    slot 為呼叫端先取得的名額 (為了在回應開始前就能回覆忙線)，交給上游後由上游結束時釋放；
+    沒給則自行取得。
+    相同問題正在串流時加入同一個串流 (先補上已產生的片段)，不另外佔用名額；
+    上游的錯誤/逾時會傳給每個訂閱者，所有訂閱者都離開時才取消 LLM 請求。
+    """
+    answer = exact_cached_answer(question)
+    if answer is not None:
+        if slot:
+            slot.release()
+        yield answer
+        return
+
+    key = normalize_question(question)
+    if stream_flight.in_flight(key) and slot:
+        slot.release()
+        slot = None
+    tokens = stream_flight.stream(key, lambda: _generate_stream(question, slot))
+    try:
+        async for token in tokens:
+            yield token
+    finally:
+        await tokens.aclose()
+
+async def _generate_stream(question: str, slot: _RagSlot = None):
+    """
+    stream_answer 的上游 (每個問題同時只有一個)。
+    命中答案快取時一次送出整段回答；完整生成的回答會寫入快取。
+    檢索受 RAG_RETRIEVAL_TIMEOUT 限制；生成則以 RAG_GENERATION_TIMEOUT 為整體期限。
+    開始執行後名額歸上游所有，結束 (含被關閉或取消) 時才釋放；
+    finally 會關閉上游的 astream，一併取消 LLM 請求。
+    """
+    if slot:
+        slot.owned = True
+    stream = None
+    try:
+        if not await asyncio.to_thread(ensure_rag_chain):
+            yield RAG_UNAVAILABLE_MESSAGE
+            return
+
+        answer, vector = await semantic_cached_answer(question)
+        if answer is not None:
+            yield answer
+            return
+
+        slot = slot or await acquire_rag_slot()
+        context = await retrieve_context(question)
+        deadline = time.monotonic() + RAG_GENERATION_TIMEOUT
+        stream = generation_chain.astream({"context": context, "question": question})
+        chunks = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+            except StopAsyncIteration:
+                break
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+        # 只快取完整送出的回答 (中途逾時或使用者離線都不會到這裡)
+        remember_answer(question, "".join(chunks), vector)
+    finally:
+        if stream is not None:
+            await stream.aclose()
+        if slot:
+            slot.release()
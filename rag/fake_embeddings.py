@@ -0,0 +1,34 @@
+# rag/fake_embeddings.py
+# 不需要網路的 embedding (EMBEDDING_MODEL=fake)：把字元 bigram 雜湊到固定維度再正規化。
+# 結果可重現，而且字面相近的句子向量也相近，足以在本機測試檢索、快取與本地索引。
+import hashlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+FAKE_EMBEDDING_DIM = 256
+
+
+class HashingEmbeddings(Embeddings):
+
+    def __init__(self, dim: int = FAKE_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = text.lower()
+        grams = [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+        for gram in grams:
+            digest = hashlib.md5(gram.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
@@ -0,0 +1,31 @@
+# rag/hybrid.py
+# 混合檢索：向量檢索與 BM25 各取 candidate_k 筆，以 RRF 融合後只留前 k 筆，
+# 用較少的 context 保住姓名、背號、術語 (FA、WBC…) 這類關鍵字的召回率。
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag.bm25 import BM25Index, reciprocal_rank_fusion
+
+
+class HybridRetriever(BaseRetriever):
+    vector_retriever: BaseRetriever
+    bm25: BM25Index
+    k: int = 8
+    candidate_k: int = 20
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _fuse(self, query: str, dense: list) -> list:
+        lexical = [self.bm25.texts[i] for i, _ in self.bm25.search(query, self.candidate_k)]
+        # 以內容當 key：同一塊在兩邊都出現時合併分數 (Pinecone 回傳的 Document 沒有穩定的 id)
+        by_text = {doc.page_content: doc for doc in dense}
+        fused = reciprocal_rank_fusion([[doc.page_content for doc in dense], lexical], self.k)
+        return [by_text.get(text) or Document(page_content=text) for text in fused]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        dense = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self._fuse(query, dense)
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        dense = await self.vector_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return self._fuse(query, dense)
@@ -1,12 +1,19 @@
+import argparse
 import os
 import sys
 # 將專案根目錄加入路徑，以便讀取 .env
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain_core.documents import Document
+
+from rag.corpus import compute_corpus_version, write_corpus_version
+from rag.embedding_cache import cached_embeddings
+from rag.local_index import LOCAL_INDEX_DIR, LocalIndexWriter
+from rag.manifest import IngestManifest, content_id
+from rag.pipeline import (
+    CHUNK_OVERLAP, CHUNK_SIZE, INGEST_WORKERS, batched, iter_documents, iter_source_files, run_batches,
+    source_name, with_backoff,
+)
 
 load_dotenv()
 
@@ -14,37 +21,161 @@ load_dotenv()
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 # 指向 rag_data 資料夾下的 data.txt
 DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)),  "data.txt")
+# 每批 embedding / upsert 的筆數；每批完成後寫入 checkpoint，中斷後重跑只會處理剩下的部分
+INGEST_BATCH_SIZE = int(os.getenv("RAG_INGEST_BATCH_SIZE", "100"))
 
-def main():
-    if not os.path.exists(DATA_FILE):
-        print(f"❌ 錯誤：找不到 {DATA_FILE}，請確認檔案位置。")
-        return
+def sync_vectorstore(vectorstore, documents, manifest: IngestManifest, target: str, sources: set,
+                     batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> tuple:
+    """
+    串流比對 manifest：只有不在 manifest 中的內容會 embedding + upsert (並行、失敗重試)，
+    跑完後刪除 sources 中已不存在的舊內容。回傳 (新增筆數, 刪除筆數)。
+    """
+    seen = set()
+    added = 0
 
-    print(f"📂 正在讀取 {DATA_FILE}...")
-    documents = []
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                documents.append(Document(page_content=line))
+    def new_documents():
+        for doc in documents:
+            if doc.id in seen:
+                continue
+            seen.add(doc.id)
+            if (target, doc.id) not in manifest:
+                yield doc
 
-    if not documents:
-        print("⚠️ 檔案是空的。")
-        return
+    def upsert(batch):
+        texts = [doc.page_content for doc in batch]
+        # 先單獨做 embedding (寫入快取)，upsert 重試時不會重複呼叫 embedding API
+        with_backoff(vectorstore.embeddings.embed_documents, texts)
+        with_backoff(
+            vectorstore.add_texts, texts,
+            metadatas=[doc.metadata for doc in batch], ids=[doc.id for doc in batch], batch_size=batch_size,
+        )
+        return batch
+
+    def on_done(batch):
+        nonlocal added
+        manifest.checkpoint(target, added={doc.id: {"source": doc.metadata["source"]} for doc in batch})
+        added += len(batch)
+        print(f"  … {target}: 已寫入 {added} 筆")
 
-    print(f"🔄 正在上傳 {len(documents)} 筆資料到 Pinecone Index: {INDEX_NAME}...")
+    run_batches(batched(new_documents(), batch_size), upsert, on_done, workers=workers)
 
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    stale = manifest.stale(target, sources, seen)
+    for batch in batched(stale, batch_size):
+        with_backoff(vectorstore.delete, ids=batch)
+        manifest.checkpoint(target, removed=batch)
 
+    manifest.save()
+    return added, len(stale)
+
+def _reset_blog_index() -> bool:
+    """ 部落格文章/留言 (rag/blog_index.py) 與語料同一個 namespace，清空 index 時一併清掉它們的索引進度 """
+    if not os.getenv("DATABASE_URL"):
+        print("⚠️ 未設定 DATABASE_URL，無法清除部落格內容的索引進度；"
+              "請之後執行 python -m rag.blog_index --full 重新寫入文章與留言。")
+        return False
+    from rag.blog_index import reset_blog_index
+    reset_blog_index()
+    return True
+
+def upload_pinecone(documents, embeddings, manifest: IngestManifest, sources: set, full: bool = False,
+                    batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> bool:
+    from langchain_pinecone import PineconeVectorStore
+
+    target = f"pinecone:{INDEX_NAME}"
+    print(f"🔄 正在同步資料到 Pinecone Index: {INDEX_NAME}...")
     try:
-        PineconeVectorStore.from_documents(
-            documents=documents,
-            embedding=embeddings,
-            index_name=INDEX_NAME
+        vectorstore = PineconeVectorStore(index_name=INDEX_NAME, embedding=embeddings)
+        reindex_blog = False
+        if full:
+            # 清空後全部重寫 (用來清掉舊版 ingest 以隨機 ID 寫入的重複資料)；
+            # 先清部落格索引進度再清 index，中途失敗時下次只會多重寫，不會漏
+            reindex_blog = _reset_blog_index()
+            vectorstore.delete(delete_all=True)
+            manifest.reset(target)
+        added, removed = sync_vectorstore(vectorstore, documents, manifest, target, sources,
+                                          batch_size=batch_size, workers=workers)
+        print(f"✅ 同步完成！新增 {added} 筆、刪除 {removed} 筆。")
+        if reindex_blog:
+            from rag.blog_index import index_blog
+            print(f"✅ 部落格內容重新寫入: {index_blog()}")
+        return True
+    except Exception as e:
+        print(f"❌ 上傳失敗: {e} (已完成的批次已記錄，重新執行會從中斷處繼續)")
+        return False
+
+def build_local_index(documents, embeddings, batch_size: int = INGEST_BATCH_SIZE,
+                      workers: int = INGEST_WORKERS) -> bool:
+    # 本地索引每次整個重建：embedding 都來自快取，沒變的內容不會呼叫 API
+    print(f"🔄 正在建立本地向量索引 -> {LOCAL_INDEX_DIR}")
+    seen = set()
+
+    def unique_documents():
+        for doc in documents:
+            if doc.id not in seen:
+                seen.add(doc.id)
+                yield doc
+
+    def embed(batch):
+        return batch, with_backoff(embeddings.embed_documents, [doc.page_content for doc in batch])
+
+    try:
+        writer = LocalIndexWriter(LOCAL_INDEX_DIR, model=embeddings.model)
+        run_batches(
+            batched(unique_documents(), batch_size), embed,
+            lambda result: writer.add([doc.page_content for doc in result[0]], result[1],
+                                      [doc.metadata for doc in result[0]]),
+            workers=workers,
         )
-        print("✅ 上傳成功！資料已存入 Pinecone。")
+        writer.close()
+        print(f"✅ 本地向量索引建立完成 ({writer.count} 筆)。")
+        return True
     except Exception as e:
-        print(f"❌ 上傳失敗: {e}")
+        print(f"❌ 本地向量索引建立失敗: {e}")
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="將語料寫入向量庫 (串流處理，只處理與上次的差異)")
+    parser.add_argument("paths", nargs="*", default=[DATA_FILE], help="來源檔案或資料夾 (預設 data.txt)")
+    parser.add_argument(
+        "--target", choices=("pinecone", "local", "both"),
+        default="both" if INDEX_NAME else "local",
+        help="寫入 Pinecone、本地索引或兩者 (預設：有設定 PINECONE_INDEX_NAME 時為 both，否則 local)",
+    )
+    parser.add_argument("--full", action="store_true", help="清空 Pinecone index 後全部重新寫入 (含部落格文章與留言)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    args = parser.parse_args()
+
+    files = list(iter_source_files(args.paths))
+    if not files:
+        print(f"❌ 錯誤：找不到任何來源檔 ({', '.join(args.paths)})，請確認檔案位置。")
+        return
+    sources = {source_name(path) for path in files}
+    print(f"📂 來源檔 {len(files)} 個: {', '.join(sorted(sources))}")
+
+    def documents():
+        # 每個目標各自重新串流讀取，不把語料留在記憶體
+        return iter_documents(files, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    # 沒變的內容直接取用快取的 embedding，只有新增/修改的部分會呼叫 API
+    # (兩個目標共用同一份 embedding 快取，本地索引不會多花 API 呼叫)
+    embeddings = cached_embeddings()
+    manifest = IngestManifest()
+
+    ok = True
+    if args.target in ("pinecone", "both"):
+        ok = upload_pinecone(documents(), embeddings, manifest, sources, full=args.full,
+                             batch_size=args.batch_size, workers=args.workers) and ok
+    if args.target in ("local", "both"):
+        ok = build_local_index(documents(), embeddings, batch_size=args.batch_size, workers=args.workers) and ok
+
+    if ok:
+        # 更新知識庫版本，執行中的服務會讓舊的答案快取失效
+        versions = "".join(compute_corpus_version(path) for path in files)
+        write_corpus_version(versions if len(files) == 1 else content_id(versions)[:16])
+    print(f"新計算 embedding {embeddings.embedded} 筆")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,173 @@
+# rag/local_index.py
+# 行程內的向量索引：整個 data.txt 只有幾百行，所有 embedding 放在一個連續的 float32 矩陣，
+# 以 np.load(mmap_mode="r") 載入 (多個 worker 共用同一份 page cache)，
+# 查詢時一次矩陣乘法算完 cosine 相似度。
+# 可透過 RAG_VECTOR_BACKEND=local 取代 Pinecone，或在 Pinecone 失敗時自動備援。
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from rag.corpus import ROOT_DIR
+
+LOCAL_INDEX_DIR = os.getenv("RAG_LOCAL_INDEX_DIR", os.path.join(ROOT_DIR, ".cache", "local_index"))
+_VECTORS_FILE = "vectors.npy"
+_META_FILE = "meta.json"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def local_index_exists(path: str = LOCAL_INDEX_DIR) -> bool:
+    return os.path.exists(os.path.join(path, _VECTORS_FILE)) and os.path.exists(os.path.join(path, _META_FILE))
+
+
+class LocalIndexWriter:
+    """
+    串流建立本地索引 (rag/ingest.py 使用)：向量與文字先逐批附加到暫存檔，
+    close() 時才組成 vectors.npy / meta.json 並以 rename 取代舊索引，
+    建立過程的記憶體用量與語料大小無關。
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_DIR, model: str = None):
+        self.path = path
+        self.model = model
+        self.count = 0
+        self.dim = None
+        os.makedirs(path, exist_ok=True)
+        self._vectors_tmp = os.path.join(path, "vectors.f32.tmp")
+        self._texts_tmp = os.path.join(path, "texts.jsonl.tmp")
+        self._vectors_file = open(self._vectors_tmp, "wb")
+        self._texts_file = open(self._texts_tmp, "w", encoding="utf-8")
+
+    def add(self, texts: list, vectors, metadatas: list = None):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"embedding 維度 {vectors.shape[1]} 與索引的 {self.dim} 不符")
+        self._vectors_file.write(np.ascontiguousarray(vectors).tobytes())
+        for text, metadata in zip(texts, metadatas or [{} for _ in texts]):
+            self._texts_file.write(json.dumps([text, metadata], ensure_ascii=False) + "\n")
+        self.count += len(texts)
+
+    def _write_meta(self, f):
+        f.write('{"model": %s, "texts": [' % json.dumps(self.model))
+        for field in (0, 1):
+            if field:
+                f.write('], "metadatas": [')
+            with open(self._texts_tmp, "r", encoding="utf-8") as texts:
+                for i, line in enumerate(texts):
+                    f.write((", " if i else "") + json.dumps(json.loads(line)[field], ensure_ascii=False))
+        f.write("]}")
+
+    def close(self):
+        self._vectors_file.close()
+        self._texts_file.close()
+        vectors_tmp = os.path.join(self.path, _VECTORS_FILE + ".tmp")
+        meta_tmp = os.path.join(self.path, _META_FILE + ".tmp")
+        shape = (self.count, self.dim or 0)
+        if self.count:
+            matrix = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=np.float32, shape=shape)
+            raw = np.memmap(self._vectors_tmp, dtype=np.float32, mode="r", shape=shape)
+            for start in range(0, self.count, 4096):
+                matrix[start:start + 4096] = raw[start:start + 4096]
+            matrix.flush()
+            del raw, matrix
+        else:
+            with open(vectors_tmp, "wb") as f:
+                np.save(f, np.zeros(shape, dtype=np.float32))
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            self._write_meta(f)
+        os.replace(vectors_tmp, os.path.join(self.path, _VECTORS_FILE))
+        os.replace(meta_tmp, os.path.join(self.path, _META_FILE))
+        os.remove(self._vectors_tmp)
+        os.remove(self._texts_tmp)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    vectors 為已正規化的 (N, dim) float32 矩陣，texts/metadatas 與之逐列對應。
+    唯讀：不提供 add_texts，內容變動時以 rag/ingest.py 整個重建 (部落格內容索引也不會寫入本地索引)。
+    """
+
+    def __init__(self, embedding, vectors: np.ndarray, texts: list, metadatas: list = None, model: str = None):
+        self._embedding = embedding
+        self.vectors = vectors
+        self.texts = texts
+        self.metadatas = metadatas or [{} for _ in texts]
+        self.model = model
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    # --- 建立 / 儲存 / 載入 ---
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        texts = list(texts)
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        return cls(embedding, _normalize(vectors), texts, metadatas, model=kwargs.get("model"))
+
+    def save(self, path: str = LOCAL_INDEX_DIR):
+        """ 先寫暫存檔再 rename，執行中的服務不會讀到寫到一半的索引 """
+        os.makedirs(path, exist_ok=True)
+        vectors_tmp = os.path.join(path, _VECTORS_FILE + ".tmp")
+        meta_tmp = os.path.join(path, _META_FILE + ".tmp")
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "texts": self.texts, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        os.replace(vectors_tmp, os.path.join(path, _VECTORS_FILE))
+        os.replace(meta_tmp, os.path.join(path, _META_FILE))
+
+    @classmethod
+    def load(cls, embedding, path: str = LOCAL_INDEX_DIR, model: str = None):
+        vectors = np.load(os.path.join(path, _VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(path, _META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if model and meta.get("model") and meta["model"] != model:
+            raise ValueError(f"本地索引的 embedding 模型為 {meta['model']}，與目前的 {model} 不符")
+        if len(meta["texts"]) != vectors.shape[0]:
+            raise ValueError("本地索引的向量與文字數量不一致")
+        return cls(embedding, vectors, meta["texts"], meta.get("metadatas"), model=meta.get("model"))
+
+    # --- 查詢 ---
+
+    def _top_k(self, vector, k: int):
+        if not self.texts:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i] or {})), float(scores[i]))
+            for i in top
+        ]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self._top_k(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self._top_k(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        # 只有 embedding 需要 await；矩陣乘法只要幾十微秒，直接在 event loop 上算，不丟到 thread
+        return self._top_k(await self._embedding.aembed_query(query), k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
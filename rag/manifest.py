@@ -0,0 +1,105 @@
+# rag/manifest.py
+# 記錄每個向量庫目前已寫入哪些內容，讓 rag/ingest.py 只處理差異：
+# 新增的內容才 embedding + upsert，來源檔裡已刪除的內容從向量庫刪除。
+# 向量 ID 取自內容的雜湊，同一行重跑幾次都是同一個 ID，不會產生重複資料。
+#
+# 每完成一批就在 <manifest>.journal 附加一行 (checkpoint)，成本與 manifest 大小無關；
+# 跑完後 save() 把 journal 合併回 manifest。中途中斷時，下次載入會重播 journal，
+# 已完成的批次不會再處理。
+import hashlib
+import json
+import os
+
+from rag.corpus import ROOT_DIR
+
+INGEST_MANIFEST_FILE = os.getenv("RAG_INGEST_MANIFEST", os.path.join(ROOT_DIR, ".cache", "ingest_manifest.json"))
+MANIFEST_FORMAT = 1
+
+
+def content_id(text: str) -> str:
+    """ 內容定址的向量 ID (SHA-256 前 32 碼) """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    {target: {vector_id: metadata}}；target 例如 "pinecone:<index>"。
+    metadata 至少包含 source，用來只刪除本次有處理到的來源檔中的舊內容。
+    """
+
+    def __init__(self, path: str = INGEST_MANIFEST_FILE):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.targets = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") == MANIFEST_FORMAT:
+                self.targets = data.get("targets", {})
+            else:
+                print(f"⚠️ {path} 格式不符，視為空的 manifest (下次會全部重新寫入)")
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        replayed = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 最後一行可能只寫了一半 (寫入時被中斷)，忽略
+                    continue
+                self._apply(entry["target"], entry.get("added"), entry.get("removed"), entry.get("reset", False))
+                replayed += 1
+        if replayed:
+            print(f"↩️ 從上次中斷處繼續 (已完成 {replayed} 個批次)")
+
+    def _apply(self, target: str, added: dict = None, removed: list = None, reset: bool = False):
+        if reset:
+            self.targets[target] = {}
+        indexed = self.ids(target)
+        for vector_id in removed or ():
+            indexed.pop(vector_id, None)
+        indexed.update(added or {})
+
+    def _append_journal(self, entry: dict):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def ids(self, target: str) -> dict:
+        return self.targets.setdefault(target, {})
+
+    def __contains__(self, key) -> bool:
+        target, vector_id = key
+        return vector_id in self.targets.get(target, ())
+
+    def stale(self, target: str, sources: set, seen) -> list:
+        """ 來源屬於 sources、但本次沒有出現 (不在 seen) 的 ID """
+        return [
+            vector_id for vector_id, meta in self.ids(target).items()
+            if meta.get("source") in sources and vector_id not in seen
+        ]
+
+    def checkpoint(self, target: str, added: dict = None, removed: list = None):
+        """ 記錄一個已完成的批次 (立即寫入 journal) """
+        self._apply(target, added, removed)
+        self._append_journal({"target": target, "added": added or {}, "removed": removed or []})
+
+    def reset(self, target: str):
+        self._apply(target, reset=True)
+        self._append_journal({"target": target, "reset": True})
+
+    def save(self):
+        """ 合併 journal：先寫暫存檔再 rename，之後才刪除 journal """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": MANIFEST_FORMAT, "targets": self.targets}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
@@ -0,0 +1,133 @@
+# rag/pipeline.py
+# rag/ingest.py 使用的串流處理流程，整個過程不會把語料整個讀進記憶體：
+#   來源 (多個檔案/資料夾) → 逐行讀取 → 切塊 (長段落加上重疊) → 固定大小的批次
+#   → 執行緒池並行 embedding / upsert (失敗時指數退避重試，同時進行的批次數有上限)
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from rag.corpus import ROOT_DIR
+from rag.manifest import content_id
+
+INGEST_EXTENSIONS = tuple(os.getenv("RAG_INGEST_EXTENSIONS", ".txt,.md").split(","))
+# 超過 CHUNK_SIZE 個字元的段落才切塊，相鄰塊重疊 CHUNK_OVERLAP 個字元
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "50"))
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", "4"))
+INGEST_RETRIES = int(os.getenv("RAG_INGEST_RETRIES", "5"))
+INGEST_BACKOFF_BASE = 1.0
+INGEST_BACKOFF_MAX = 30.0
+
+_SENTENCE_ENDS = "。！？!?.；;\n"
+
+
+def iter_source_files(paths):
+    """ 展開檔案與資料夾 (遞迴，只取 INGEST_EXTENSIONS)，依路徑排序，結果可重現 """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(INGEST_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif os.path.exists(path):
+            yield path
+        else:
+            print(f"⚠️ 找不到 {path}，略過")
+
+
+def source_name(path: str) -> str:
+    """ metadata 中的來源：專案內的檔案用相對路徑 (data.txt)，其餘用絕對路徑 """
+    path = os.path.abspath(path)
+    if path.startswith(ROOT_DIR + os.sep):
+        return os.path.relpath(path, ROOT_DIR).replace(os.sep, "/")
+    return path
+
+
+def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    """ 切成不超過 size 個字元的塊，盡量在句尾斷開；短於 size 的文字原樣回傳 """
+    if len(text) <= size:
+        yield text
+        return
+    overlap = min(overlap, size // 2)
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # 在視窗後 1/5 內找句尾，避免把句子切成兩半
+            cut = max(text.rfind(ch, end - size // 5, end) for ch in _SENTENCE_ENDS)
+            if cut > start:
+                end = cut + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+
+
+def iter_chunks(paths, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """ 逐行讀取每個來源檔 (每個非空行是一段) 並切塊，產生 (來源, 行號, 塊號, 內容) """
+    for path in iter_source_files(paths):
+        source = source_name(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                for chunk_no, chunk in enumerate(chunk_text(line, chunk_size, chunk_overlap)):
+                    yield source, line_no, chunk_no, chunk
+
+
+def iter_documents(paths, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """ iter_chunks 的每一塊包成以內容雜湊為 ID 的 Document """
+    from langchain_core.documents import Document  # rag/blog_index.py 也會載入本模組，保持 import 輕量
+
+    for source, line_no, chunk_no, chunk in iter_chunks(paths, chunk_size, chunk_overlap):
+        vector_id = content_id(chunk)
+        yield Document(id=vector_id, page_content=chunk, metadata={
+            "source": source, "line": line_no, "chunk": chunk_no, "content_id": vector_id,
+        })
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def with_backoff(fn, *args, retries: int = INGEST_RETRIES, **kwargs):
+    """ 失敗時以指數退避 (加上隨機抖動) 重試，超過次數才丟出例外 """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(INGEST_BACKOFF_BASE * 2 ** attempt, INGEST_BACKOFF_MAX) * random.uniform(0.5, 1.0)
+            print(f"⚠️ {getattr(fn, '__name__', 'call')} 失敗 ({e})，{delay:.1f} 秒後重試 ({attempt + 1}/{retries})")
+            time.sleep(delay)
+
+
+def run_batches(batches, work, on_done, workers: int = INGEST_WORKERS):
+    """
+    以 workers 個執行緒處理 batches，最多同時有 2 * workers 個批次在處理中 (記憶體用量固定)；
+    on_done 在主執行緒依完成順序被呼叫 (manifest / 索引的寫入不需要加鎖)。
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(work, batch))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    on_done(future.result())
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                on_done(future.result())
@@ -0,0 +1,65 @@
+# rag/text.py
+# 文字處理的共用工具：RAG 的 BM25 / context 組裝、部落格內容索引與全文檢索 (db/search.py) 使用同一套斷詞，
+# 只依賴標準庫，app 啟動時載入也不會拖慢 import。
+import html
+import re
+from html.parser import HTMLParser
+
+# 中文沒有空白斷詞，以連續漢字的 bigram 作為詞；英數字以整段 (轉小寫) 作為詞
+_TOKEN_PATTERN = re.compile(r"[㐀-鿿豈-﫿]+|[a-z0-9]+")
+
+
+def token_runs(text: str) -> list:
+    """ 連續的漢字段或英數字段 (轉小寫)，tokenize() 與搜尋結果的標示都以它為單位 """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def tokenize(text: str) -> list:
+    """ 漢字連續段切成 bigram (單字成段時保留單字)；英數字整段保留 """
+    tokens = []
+    for run in token_runs(text):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+_BLOCK_TAGS = {"p", "br", "div", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "tr"}
+_SKIP_TAGS = {"script", "style"}
+
+
+class _TextExtractor(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def strip_html(content: str) -> str:
+    """ 去除 HTML 標籤，區塊元素轉成換行，每段內的空白壓成一個 """
+    parser = _TextExtractor()
+    parser.feed(content)
+    parser.close()
+    text = html.unescape("".join(parser.parts))
+    paragraphs = (re.sub(r"\s+", " ", line).strip() for line in text.split("\n"))
+    return "\n".join(p for p in paragraphs if p)
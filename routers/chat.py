@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 from auth.firebase import require_firebase_token
-from rag.engine import get_answer
+from rag.engine import (
+    RAG_TIMEOUT_MESSAGE, RagBusyError, acquire_rag_slot, answer_in_flight, exact_cached_answer, get_answer,
+    stream_answer,
+)
 
 router = APIRouter()
 
@@ -11,15 +18,89 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     reply: str
 
+def rag_busy() -> HTTPException:
+    # 滿載時立即回覆，讓前端稍後重試，而不是佔著連線排隊
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="小幫手忙線中，請稍後再試。",
+        headers={"Retry-After": "5"},
+    )
+
 @router.post("/api/chat", response_model=ChatResponse)
-def chat_with_ai(
+async def chat_with_ai(
     request: ChatRequest,
     # 【關鍵】使用 Firebase Token 驗證，而非 API Key
     token_payload: dict = Depends(require_firebase_token) 
 ):
     user_question = request.message
     
-    # 呼叫 RAG 引擎
-    ai_reply = get_answer(user_question)
+    # 呼叫 RAG 引擎 (async，不佔用 threadpool)
+    try:
+        ai_reply = await get_answer(user_question)
+    except RagBusyError:
+        raise rag_busy()
     
-    return ChatResponse(reply=ai_reply)
\ No newline at end of file
+    return ChatResponse(reply=ai_reply)
+
+def sse_event(data: dict, event: str = None) -> str:
+    """ 組成一筆 Server-Sent Event；資料以 JSON 編碼，換行不會破壞格式 """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/api/chat/stream")
+async def chat_with_ai_stream(
+    request: ChatRequest,
+    http_request: Request,
+    token_payload: dict = Depends(require_firebase_token)
+):
+    """
+    以 SSE 逐 token 回傳回答：每個片段為 `data: {"token": ...}`，
+    結束時送出 `event: done`，發生錯誤時送出 `event: error`。
+    """
+    # 快取命中的問題直接回覆，不佔用名額 (滿載時也能回答)
+    cached = exact_cached_answer(request.message)
+    if cached is not None:
+        async def cached_stream():
+            yield sse_event({"token": cached})
+            yield sse_event({}, event="done")
+
+        return StreamingResponse(
+            cached_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # 在回應開始前取得名額，滿載時才能回 503 而不是已經送出的 200；
+    # 相同問題正在生成時會加入同一個串流，不需要名額
+    slot = None
+    if not answer_in_flight(request.message):
+        try:
+            slot = await acquire_rag_slot()
+        except RagBusyError:
+            raise rag_busy()
+
+    async def event_stream():
+        tokens = stream_answer(request.message, slot=slot)
+        try:
+            async for token in tokens:
+                # 使用者關閉頁面後停止，關閉 tokens 會取消上游的 LLM 請求
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event({"token": token})
+            else:
+                yield sse_event({}, event="done")
+        except asyncio.TimeoutError:
+            yield sse_event({"message": RAG_TIMEOUT_MESSAGE}, event="error")
+        except Exception as e:
+            yield sse_event({"message": f"發生錯誤: {str(e)}"}, event="error")
+        finally:
+            await tokens.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # 串流沒開始就中斷時 (上游還沒接手名額) 也要歸還名額；
+        # 上游已接手時由上游結束時釋放，它可能還在為其他訂閱者生成
+        background=BackgroundTask(slot.release_unowned) if slot else None,
+    )
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from routers import posts as post_router
+from auth import firebase as firebase_auth
+from db.engine import USE_ASYNC_DB, get_pool_status
+from rag import engine as rag_engine
+from rag.answer_cache import answer_cache
+
+# 內部的快取、連線池與 RAG 負載資訊只開放給管理者 (ADMIN_UIDS)
+router = APIRouter(dependencies=[Depends(firebase_auth.require_admin)])
+
+@router.get("/api/metrics/cache")
+def get_cache_metrics():
+    """ 各個行程內快取的命中率與大小，用來調整容量設定 """
+    verifier = firebase_auth._token_verifier
+    if USE_ASYNC_DB:
+        from routers.posts_async import post_flight  # app.py 已載入
+    else:
+        post_flight = post_router.post_flight
+    return {
+        "slug": post_router.slug_cache.stats(),
+        "author": post_router.author_cache.stats(),
+        "token": verifier.cache.stats() if verifier else None,
+        "answer": answer_cache.stats() if answer_cache else None,
+        "embedding": rag_engine.embeddings.stats() if rag_engine.embeddings else None,
+        # 請求合併：executions 為實際執行次數，shared 為共用結果的請求數
+        "singleflight": {
+            "answer": rag_engine.answer_flight.stats(),
+            "answer_stream": rag_engine.stream_flight.stats(),
+            "post": post_flight.stats(),
+        },
+    }
+
+
+@router.get("/api/metrics/pool")
+def get_pool_metrics():
+    """ 資料庫連線池設定與取得連線的等待時間 """
+    return get_pool_status()
+
+
+@router.get("/api/metrics/rag")
+def get_rag_metrics():
+    """ prompt context 組裝前後的文件數與 token 數 """
+    from rag.context import context_stats  # 用到時才載入 (含 numpy)
+
+    return {"context": context_stats.snapshot()}
@@ -1,60 +1,344 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from db.engine import get_db
 from models import posts as post_model, comments as comment_model, likes as like_model, authors as author_model
 from schemas import posts as post_schema
 from auth.firebase import require_firebase_token  # <--- 【關鍵】記得匯入這個驗證器
+from cache.http import (
+    CACHE_CONTROL_POST, CACHE_CONTROL_POST_CHILDREN, CACHE_CONTROL_POST_LIST, conditional_response, make_etag,
+    to_utc, version_token,
+)
+from cache.lru import LRUCache
+from cache.singleflight import SingleFlight
+from routers.responses import json_response
+from rag.blog_index import BLOG_INDEX_ON_COMMENT, schedule_blog_index
 
 router = APIRouter()
 
+# 文章列表分頁設定
+POSTS_PAGE_SIZE = 12
+POSTS_PAGE_SIZE_MAX = 50
+
+# slug -> post_id 快取，讓子資源與寫入路由不必再載入整列文章 (含 content)
+slug_cache = LRUCache(
+    maxsize=int(os.getenv("SLUG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SLUG_CACHE_TTL", "300")),
+)
+
+# Firebase uid -> 作者資料 (id / name / profilePic) 快取，已知的使用者寫入時不必再解析作者
+author_cache = LRUCache(
+    maxsize=int(os.getenv("AUTHOR_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("AUTHOR_CACHE_TTL", "3600")),
+)
+
+# 熱門文章同時被大量讀取時，相同 slug 只查一次資料庫，其他請求共用結果
+# (key 為 ("version", slug) 的版本探測與 ("post", slug) 的文章內容)；
+# 等待超過 POST_FLIGHT_TIMEOUT 秒就自行查詢
+POST_FLIGHT_TIMEOUT = float(os.getenv("POST_FLIGHT_TIMEOUT", "5"))
+post_flight = SingleFlight(timeout=POST_FLIGHT_TIMEOUT)
+
 # --- 輔助函式 ---
-def get_or_create_author(db: Session, author_name: str, profile_pic: str = None):
-    db_author = db.query(author_model.Author).filter(author_model.Author.name == author_name).first()
-    if not db_author:
-        db_author = author_model.Author(name=author_name, profilePic=profile_pic)
-        db.add(db_author)
-        try:
-            db.commit()
-            db.refresh(db_author)
-        except Exception as e:
-            db.rollback()
-            db_author = db.query(author_model.Author).filter(author_model.Author.name == author_name).first()
-            if not db_author:
-                 raise HTTPException(status_code=500, detail=f"Failed to create author: {e}")
-    return db_author
+def dialect_insert(db: Session):
+    """ 依資料庫種類取得支援 ON CONFLICT 的 insert() """
+    return sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+
+@event.listens_for(Session, "after_commit")
+def _remember_committed_authors(session):
+    # 作者資料只在交易成功提交後才放入快取，避免快取到被 rollback 的 id
+    for uid, author in session.info.pop("pending_authors", {}).items():
+        author_cache.set(uid, author)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_authors(session):
+    session.info.pop("pending_authors", None)
+
+def author_identity(token_payload: dict, profile_pic: str = None):
+    """ 從 token 取出 (uid, 顯示名稱, 頭像) """
+    uid = token_payload['uid']
+    author_name = token_payload.get('name') or token_payload.get('email', '匿名用戶')
+    return uid, author_name, profile_pic or token_payload.get('picture')
+
+def author_is_current(cached, author_name: str, profile_pic: str = None) -> bool:
+    """ 快取中的作者資料是否仍與 token 一致 """
+    return bool(cached) and cached["name"] == author_name and (not profile_pic or cached["profilePic"] == profile_pic)
+
+def upsert_author_stmt(db, uid: str, author_name: str, profile_pic: str = None):
+    author_table = author_model.Author.__table__
+    stmt = dialect_insert(db)(author_table).values(uid=uid, name=author_name, profilePic=profile_pic)
+    return stmt.on_conflict_do_update(
+        index_elements=["uid"],
+        set_={
+            "name": stmt.excluded.name,
+            "profilePic": func.coalesce(stmt.excluded.profilePic, author_table.c.profilePic),
+        },
+    ).returning(author_table.c.id, author_table.c.name, author_table.c.profilePic)
+
+def remember_author(db, uid: str, row) -> dict:
+    """ 將 upsert 結果登記為待快取，commit 成功後才放入 author_cache """
+    author = {"id": row.id, "name": row.name, "profilePic": row.profilePic}
+    db.info.setdefault("pending_authors", {})[uid] = author
+    return author
+
+def resolve_author(db: Session, token_payload: dict, profile_pic: str = None) -> dict:
+    """
+    以 token 中的 Firebase uid 取得作者 (dict: id / name / profilePic)。
+    命中快取時不查詢資料庫；否則以單一 upsert ... RETURNING 建立或更新作者，
+    由呼叫端的 commit 一併提交。
+    """
+    uid, author_name, profile_pic = author_identity(token_payload, profile_pic)
+    cached = author_cache.get(uid)
+    if author_is_current(cached, author_name, profile_pic):
+        return cached
+
+    row = db.execute(upsert_author_stmt(db, uid, author_name, profile_pic)).one()
+    return remember_author(db, uid, row)
+
+def resolve_post_id(db: Session, slug: str) -> int:
+    """ 由 slug 取得 post_id，命中快取時不查詢資料庫；找不到文章時回傳 404 """
+    post_id = slug_cache.get(slug)
+    if post_id is None:
+        post_id = db.execute(post_id_stmt(slug)).scalar()
+        if post_id is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        slug_cache.set(slug, post_id)
+    return post_id
+
+def post_version(db: Session, slug: str):
+    """
+    讀取文章的版本欄位 (順便更新 slug 快取)；找不到文章時回傳 404。
+    每個 GET 都會先探測版本 (包含最後回 304 的請求)，所以同時進行的探測也要合併。
+    """
+    row = post_flight.do(("version", slug), lambda: db.execute(post_version_stmt(slug)).first())
+    if row is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    slug_cache.set(slug, row.id)
+    return row
+
+def post_etag(kind: str, row) -> str:
+    """ 文章、留言或按讚有變動時 posts.updated_at 都會更新 (計數器在同一個交易中增減) """
+    return make_etag(kind, row.id, version_token(row.updated_at), row.like_count, row.comment_count)
+
+def posts_etag(rows) -> str:
+    """ 以這一頁 (含用來判斷下一頁的那一筆) 的篇數、最後一篇 id 與最新的 updated_at 組成 """
+    return make_etag(
+        "posts", len(rows), rows[-1].id if rows else 0, version_token(posts_last_modified(rows)),
+    )
+
+def posts_last_modified(rows):
+    return max((row.updated_at for row in rows), default=None, key=to_utc)
+
+def invalidate_post_slug(slug: str = None):
+    """ 文章 slug 變更或刪除時呼叫；不給 slug 則清空整個快取 """
+    slug_cache.invalidate(slug)
+
+# --- 查詢語句 (同步與非同步路由共用，關聯一律明確 eager load) ---
+def post_id_stmt(slug: str):
+    return select(post_model.Post.id).where(post_model.Post.slug == slug)
+
+def post_version_stmt(slug: str):
+    # HTTP 快取用：只取版本欄位，不載入 ORM 物件也不 join
+    return select(
+        post_model.Post.id, post_model.Post.updated_at, post_model.Post.like_count, post_model.Post.comment_count,
+    ).where(post_model.Post.slug == slug)
+
+# --- 讀取路由的欄位投影 ---
+# 只選需要的欄位並明確 join 作者，直接組成與 schemas/posts.py 相同結構的 dict，
+# 不建立 ORM 物件、不走 relationship，也不再經過 Pydantic 驗證 (以 routers/responses.py 輸出)
+_AUTHOR_COLUMNS = (
+    author_model.Author.id.label("author_id"),
+    author_model.Author.name.label("author_name"),
+    author_model.Author.profilePic.label("author_profile_pic"),
+)
+
+def author_dict(row) -> dict:
+    return {"name": row.author_name, "profilePic": row.author_profile_pic, "id": row.author_id}
+
+def posts_page_stmt(cursor: Optional[int], limit: int):
+    # Keyset 分頁：以 id 為游標，不載入 content；多取一筆用來判斷是否還有下一頁
+    stmt = (
+        select(
+            post_model.Post.id, post_model.Post.slug, post_model.Post.title,
+            post_model.Post.like_count, post_model.Post.comment_count, post_model.Post.updated_at,
+            *_AUTHOR_COLUMNS,
+        )
+        .join(author_model.Author, author_model.Author.id == post_model.Post.author_id)
+        .order_by(post_model.Post.id)
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        stmt = stmt.where(post_model.Post.id > cursor)
+    return stmt
+
+def posts_page(rows, limit: int) -> dict:
+    """ 對應 post_schema.PostPage """
+    items = [
+        {
+            "id": row.id, "slug": row.slug, "title": row.title, "author": author_dict(row),
+            "like_count": row.like_count, "comment_count": row.comment_count,
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def post_stmt(slug: str):
+    return (
+        select(
+            post_model.Post.id, post_model.Post.slug, post_model.Post.title, post_model.Post.content,
+            post_model.Post.like_count, post_model.Post.comment_count, *_AUTHOR_COLUMNS,
+        )
+        .join(author_model.Author, author_model.Author.id == post_model.Post.author_id)
+        .where(post_model.Post.slug == slug)
+    )
+
+def post_dict(row) -> dict:
+    """ 對應 post_schema.Post (PostDetail 另外加上 comments / likes) """
+    return {
+        "slug": row.slug, "title": row.title, "content": row.content, "id": row.id, "author": author_dict(row),
+        "like_count": row.like_count, "comment_count": row.comment_count,
+    }
+
+def comments_stmt(post_id: int):
+    return (
+        select(comment_model.Comment.id, comment_model.Comment.text, *_AUTHOR_COLUMNS)
+        .join(author_model.Author, author_model.Author.id == comment_model.Comment.author_id)
+        .where(comment_model.Comment.post_id == post_id)
+        .order_by(comment_model.Comment.id)
+    )
+
+def comment_dicts(rows) -> list:
+    return [{"id": row.id, "text": row.text, "author": author_dict(row)} for row in rows]
+
+def likes_stmt(post_id: int):
+    return (
+        select(like_model.Like.id, *_AUTHOR_COLUMNS)
+        .join(author_model.Author, author_model.Author.id == like_model.Like.author_id)
+        .where(like_model.Like.post_id == post_id)
+        .order_by(like_model.Like.id)
+    )
+
+def like_dicts(rows) -> list:
+    return [{"id": row.id, "author": author_dict(row)} for row in rows]
+
+def insert_like_stmt(db, post_id: int, author_id: int):
+    # 單一 INSERT ... ON CONFLICT DO NOTHING RETURNING，
+    # 由 uq_likes_post_author 保證重複點擊不會產生重複資料
+    return (
+        dialect_insert(db)(like_model.Like)
+        .values(post_id=post_id, author_id=author_id)
+        .on_conflict_do_nothing(index_elements=["post_id", "author_id"])
+        .returning(like_model.Like.id)
+    )
+
+def existing_like_stmt(post_id: int, author_id: int):
+    return select(like_model.Like.id).where(
+        like_model.Like.post_id == post_id,
+        like_model.Like.author_id == author_id,
+    )
+
+def delete_like_stmt(post_id: int, uid: str):
+    # 以 uid 定位作者：命中快取直接用 id，否則用子查詢，不建立作者；
+    # 單一 DELETE ... RETURNING，沒有東西可刪 (未按讚或作者不存在) 時視為成功，保持冪等
+    cached = author_cache.get(uid)
+    if cached:
+        author_id = cached["id"]
+    else:
+        author_id = select(author_model.Author.id).where(author_model.Author.uid == uid).scalar_subquery()
+    return (
+        delete(like_model.Like)
+        .where(like_model.Like.post_id == post_id, like_model.Like.author_id == author_id)
+        .returning(like_model.Like.post_id)
+    )
+
+def bump_post_counter_stmt(post_id: int, column, delta: int):
+    """ 以單一 UPDATE 原子地增減文章計數器，由呼叫端負責 commit """
+    return (
+        update(post_model.Post)
+        .where(post_model.Post.id == post_id)
+        .values({column: column + delta})
+        .execution_options(synchronize_session=False)
+    )
 
 # --- GET 路由 (保持公開，不需 Token) ---
 
-@router.get("/api/posts", response_model=List[post_schema.Post])
+@router.get("/api/posts", response_model=post_schema.PostPage)
 def get_all_posts(
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="上一頁最後一篇文章的 id"),
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_PAGE_SIZE_MAX),
     db: Session = Depends(get_db),
     # 如果您希望連「看文章列表」都要登入，請把下面這行解開註解：
     # token_payload: dict = Depends(require_firebase_token) 
 ):
-    all_posts = db.query(post_model.Post).all()
-    return all_posts
+    # 列表的版本取自這一頁本身 (keyset 分頁，最多 limit + 1 列)，不必為了 ETag 掃描整張表；
+    # 回 304 時省下的是組資料與 JSON 編碼
+    rows = db.execute(posts_page_stmt(cursor, limit)).all()
+    not_modified = conditional_response(
+        request, response, posts_etag(rows), posts_last_modified(rows), CACHE_CONTROL_POST_LIST
+    )
+    if not_modified:
+        return not_modified
+    return json_response(posts_page(rows, limit), response)
 
 @router.get("/api/posts/{slug}", response_model=post_schema.Post)
-def get_post_by_slug(slug: str, db: Session = Depends(get_db)):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
+def get_post_by_slug(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("post", version), version.updated_at, CACHE_CONTROL_POST
+    )
+    if not_modified:
+        return not_modified
+
+    def load_post():
+        row = db.execute(post_stmt(slug)).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return post_dict(row)
+
+    return json_response(post_flight.do(("post", slug), load_post), response)
+
+@router.get("/api/posts/{slug}/detail", response_model=post_schema.PostDetail)
+def get_post_detail(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("detail", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    # 文章、留言、按讚各一個查詢
+    row = db.execute(post_stmt(slug)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    detail = post_dict(row)
+    detail["comments"] = comment_dicts(db.execute(comments_stmt(row.id)))
+    detail["likes"] = like_dicts(db.execute(likes_stmt(row.id)))
+    return json_response(detail, response)
 
 @router.get("/api/posts/{slug}/comments", response_model=List[post_schema.Comment])
-def get_comments_for_post(slug: str, db: Session = Depends(get_db)):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return post.comments
+def get_comments_for_post(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("comments", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    return json_response(comment_dicts(db.execute(comments_stmt(version.id))), response)
 
 @router.get("/api/posts/{slug}/likes", response_model=List[post_schema.Like])
-def get_likes_for_post(slug: str, db: Session = Depends(get_db)):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return post.likes
+def get_likes_for_post(slug: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    version = post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("likes", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    return json_response(like_dicts(db.execute(likes_stmt(version.id))), response)
 
 # --- ▼▼▼ POST / DELETE 路由 (上鎖並修正) ▼▼▼ ---
 
@@ -62,28 +346,31 @@ def get_likes_for_post(slug: str, db: Session = Depends(get_db)):
 def create_comment_for_post(
     slug: str, 
     comment_data: post_schema.CommentCreate, 
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     token_payload: dict = Depends(require_firebase_token) # <--- 【上鎖】需要登入
 ):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    post_id = resolve_post_id(db, slug)
 
-    # 【修正】從 Token 獲取作者名稱 (不再從 comment_data 讀取)
-    author_name = token_payload.get('name') or token_payload.get('email', '匿名用戶')
-    
-    db_author = get_or_create_author(db, author_name=author_name)
+    # 【修正】從 Token 的 uid 解析作者 (不再從 comment_data 讀取)
+    author = resolve_author(db, token_payload)
     
     new_comment = comment_model.Comment(
         text=comment_data.text,
-        post_id=post.id,
-        author_id=db_author.id
+        post_id=post_id,
+        author_id=author["id"]
     )
     db.add(new_comment)
+    db.execute(bump_post_counter_stmt(post_id, post_model.Post.comment_count, 1))
+    db.flush()  # 取得新留言的 id，commit 後不需再 refresh
+    comment_id = new_comment.id
     db.commit()
-    db.refresh(new_comment)
+
+    # 回應送出後再把新留言寫入 RAG 向量庫 (只處理 high-water mark 之後的留言)
+    if BLOG_INDEX_ON_COMMENT:
+        background_tasks.add_task(schedule_blog_index)
     
-    return new_comment
+    return {"id": comment_id, "text": comment_data.text, "author": author}
 
 @router.post("/api/posts/{slug}/like", response_model=post_schema.Like, status_code=status.HTTP_201_CREATED)
 def like_post(
@@ -92,33 +379,22 @@ def like_post(
     db: Session = Depends(get_db),
     token_payload: dict = Depends(require_firebase_token) # <--- 【上鎖】需要登入
 ):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    post_id = resolve_post_id(db, slug)
 
-    # 【修正】從 Token 獲取作者名稱，解決 AttributeError
-    author_name = token_payload.get('name') or token_payload.get('email', '匿名用戶')
-    profile_pic = like_data.profilePic or token_payload.get('picture')
+    # 【修正】從 Token 的 uid 解析作者
+    author = resolve_author(db, token_payload, profile_pic=like_data.profilePic)
 
-    db_author = get_or_create_author(db, author_name=author_name, profile_pic=profile_pic)
+    inserted_id = db.execute(insert_like_stmt(db, post_id, author["id"])).scalar()
 
-    existing_like = db.query(like_model.Like).filter(
-        like_model.Like.post_id == post.id,
-        like_model.Like.author_id == db_author.id
-    ).first()
-    
-    if existing_like:
-        db.refresh(existing_like)
-        return existing_like
+    if inserted_id is not None:
+        db.execute(bump_post_counter_stmt(post_id, post_model.Post.like_count, 1))
+        db.commit()
+        return {"id": inserted_id, "author": author}
 
-    new_like = like_model.Like(
-        post_id=post.id,
-        author_id=db_author.id
-    )
-    db.add(new_like)
-    db.commit()
-    db.refresh(new_like)
-    return new_like
+    # 沒有插入代表已經按過讚，回傳既有的那一筆
+    existing_like_id = db.execute(existing_like_stmt(post_id, author["id"])).scalar()
+    db.commit()  # 提交可能的作者 upsert
+    return {"id": existing_like_id, "author": author}
 
 @router.delete("/api/posts/{slug}/like", status_code=status.HTTP_204_NO_CONTENT)
 def unlike_post(
@@ -127,25 +403,10 @@ def unlike_post(
     db: Session = Depends(get_db),
     token_payload: dict = Depends(require_firebase_token) # <--- 【上鎖】需要登入
 ):
-    post = db.query(post_model.Post).filter(post_model.Post.slug == slug).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-
-    # 【修正】從 Token 獲取作者名稱
-    author_name = token_payload.get('name') or token_payload.get('email', '匿名用戶')
-    
-    db_author = db.query(author_model.Author).filter(author_model.Author.name == author_name).first()
-    
-    if not db_author:
-        return 
+    post_id = resolve_post_id(db, slug)
+    deleted_post_id = db.execute(delete_like_stmt(post_id, token_payload['uid'])).scalar()
 
-    existing_like = db.query(like_model.Like).filter(
-        like_model.Like.post_id == post.id,
-        like_model.Like.author_id == db_author.id
-    ).first()
-    
-    if existing_like:
-        db.delete(existing_like)
+    if deleted_post_id is not None:
+        db.execute(bump_post_counter_stmt(post_id, post_model.Post.like_count, -1))
         db.commit()
-        
-    return
\ No newline at end of file
+    return
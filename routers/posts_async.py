@@ -0,0 +1,201 @@
+# routers/posts_async.py
+# routers/posts.py 的 async 版本 (DB_ASYNC=1 時由 app.py 掛載)，路徑與回應格式完全相同。
+# 查詢語句、欄位投影與快取共用 routers/posts.py (讀取都是欄位投影，不會觸發 asyncio 下不允許的 lazy load)。
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from cache.http import CACHE_CONTROL_POST, CACHE_CONTROL_POST_CHILDREN, CACHE_CONTROL_POST_LIST, conditional_response
+from cache.singleflight import AsyncSingleFlight
+from routers.responses import json_response
+from db.engine import get_async_db
+from models import posts as post_model, comments as comment_model
+from schemas import posts as post_schema
+from auth.firebase import require_firebase_token
+from rag.blog_index import BLOG_INDEX_ON_COMMENT, schedule_blog_index
+from routers.posts import (
+    POST_FLIGHT_TIMEOUT, POSTS_PAGE_SIZE, POSTS_PAGE_SIZE_MAX, slug_cache, author_cache,
+    author_identity, author_is_current, upsert_author_stmt, remember_author,
+    post_id_stmt, posts_page_stmt, posts_page, post_stmt, post_dict, comments_stmt, comment_dicts,
+    likes_stmt, like_dicts,
+    post_version_stmt, post_etag, posts_etag, posts_last_modified,
+    insert_like_stmt, existing_like_stmt, delete_like_stmt, bump_post_counter_stmt,
+)
+
+router = APIRouter()
+
+# 同 routers.posts.post_flight (同一個 event loop 內合併)：領頭的請求用自己的 session 查詢，
+# 其他請求等待超過 POST_FLIGHT_TIMEOUT 秒就用自己的 session 查詢 (每個請求只佔一條連線)
+post_flight = AsyncSingleFlight()
+
+# --- 輔助函式 ---
+async def resolve_author(db: AsyncSession, token_payload: dict, profile_pic: str = None) -> dict:
+    """ 同 routers.posts.resolve_author """
+    uid, author_name, profile_pic = author_identity(token_payload, profile_pic)
+    cached = author_cache.get(uid)
+    if author_is_current(cached, author_name, profile_pic):
+        return cached
+
+    row = (await db.execute(upsert_author_stmt(db, uid, author_name, profile_pic))).one()
+    return remember_author(db, uid, row)
+
+async def resolve_post_id(db: AsyncSession, slug: str) -> int:
+    """ 同 routers.posts.resolve_post_id """
+    post_id = slug_cache.get(slug)
+    if post_id is None:
+        post_id = (await db.execute(post_id_stmt(slug))).scalar()
+        if post_id is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        slug_cache.set(slug, post_id)
+    return post_id
+
+async def post_version(db: AsyncSession, slug: str):
+    """ 同 routers.posts.post_version (同時進行的探測合併成一次查詢) """
+    async def load_version():
+        return (await db.execute(post_version_stmt(slug))).first()
+
+    row = await post_flight.do_owned(("version", slug), load_version, POST_FLIGHT_TIMEOUT)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    slug_cache.set(slug, row.id)
+    return row
+
+# --- GET 路由 (保持公開，不需 Token) ---
+
+@router.get("/api/posts", response_model=post_schema.PostPage)
+async def get_all_posts(
+    request: Request,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="上一頁最後一篇文章的 id"),
+    limit: int = Query(POSTS_PAGE_SIZE, ge=1, le=POSTS_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = (await db.execute(posts_page_stmt(cursor, limit))).all()
+    not_modified = conditional_response(
+        request, response, posts_etag(rows), posts_last_modified(rows), CACHE_CONTROL_POST_LIST
+    )
+    if not_modified:
+        return not_modified
+    return json_response(posts_page(rows, limit), response)
+
+@router.get("/api/posts/{slug}", response_model=post_schema.Post)
+async def get_post_by_slug(
+    slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("post", version), version.updated_at, CACHE_CONTROL_POST
+    )
+    if not_modified:
+        return not_modified
+
+    async def load_post():
+        row = (await db.execute(post_stmt(slug))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return post_dict(row)
+
+    return json_response(await post_flight.do_owned(("post", slug), load_post, POST_FLIGHT_TIMEOUT), response)
+
+@router.get("/api/posts/{slug}/detail", response_model=post_schema.PostDetail)
+async def get_post_detail(
+    slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("detail", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    row = (await db.execute(post_stmt(slug))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    detail = post_dict(row)
+    detail["comments"] = comment_dicts(await db.execute(comments_stmt(row.id)))
+    detail["likes"] = like_dicts(await db.execute(likes_stmt(row.id)))
+    return json_response(detail, response)
+
+@router.get("/api/posts/{slug}/comments", response_model=List[post_schema.Comment])
+async def get_comments_for_post(
+    slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("comments", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    return json_response(comment_dicts(await db.execute(comments_stmt(version.id))), response)
+
+@router.get("/api/posts/{slug}/likes", response_model=List[post_schema.Like])
+async def get_likes_for_post(
+    slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    version = await post_version(db, slug)
+    not_modified = conditional_response(
+        request, response, post_etag("likes", version), version.updated_at, CACHE_CONTROL_POST_CHILDREN
+    )
+    if not_modified:
+        return not_modified
+    return json_response(like_dicts(await db.execute(likes_stmt(version.id))), response)
+
+# --- POST / DELETE 路由 (需要登入) ---
+
+@router.post("/api/posts/{slug}/comments", response_model=post_schema.Comment, status_code=status.HTTP_201_CREATED)
+async def create_comment_for_post(
+    slug: str,
+    comment_data: post_schema.CommentCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    token_payload: dict = Depends(require_firebase_token)
+):
+    post_id = await resolve_post_id(db, slug)
+    author = await resolve_author(db, token_payload)
+
+    new_comment = comment_model.Comment(text=comment_data.text, post_id=post_id, author_id=author["id"])
+    db.add(new_comment)
+    await db.execute(bump_post_counter_stmt(post_id, post_model.Post.comment_count, 1))
+    await db.flush()
+    comment_id = new_comment.id
+    await db.commit()
+
+    # 同步函式，Starlette 會放到 threadpool 執行，不佔用 event loop
+    if BLOG_INDEX_ON_COMMENT:
+        background_tasks.add_task(schedule_blog_index)
+
+    return {"id": comment_id, "text": comment_data.text, "author": author}
+
+@router.post("/api/posts/{slug}/like", response_model=post_schema.Like, status_code=status.HTTP_201_CREATED)
+async def like_post(
+    slug: str,
+    like_data: post_schema.LikeCreate,
+    db: AsyncSession = Depends(get_async_db),
+    token_payload: dict = Depends(require_firebase_token)
+):
+    post_id = await resolve_post_id(db, slug)
+    author = await resolve_author(db, token_payload, profile_pic=like_data.profilePic)
+
+    inserted_id = (await db.execute(insert_like_stmt(db, post_id, author["id"]))).scalar()
+
+    if inserted_id is not None:
+        await db.execute(bump_post_counter_stmt(post_id, post_model.Post.like_count, 1))
+        await db.commit()
+        return {"id": inserted_id, "author": author}
+
+    existing_like_id = (await db.execute(existing_like_stmt(post_id, author["id"]))).scalar()
+    await db.commit()
+    return {"id": existing_like_id, "author": author}
+
+@router.delete("/api/posts/{slug}/like", status_code=status.HTTP_204_NO_CONTENT)
+async def unlike_post(
+    slug: str,
+    like_data: post_schema.LikeCreate,
+    db: AsyncSession = Depends(get_async_db),
+    token_payload: dict = Depends(require_firebase_token)
+):
+    post_id = await resolve_post_id(db, slug)
+    deleted_post_id = (await db.execute(delete_like_stmt(post_id, token_payload['uid']))).scalar()
+
+    if deleted_post_id is not None:
+        await db.execute(bump_post_counter_stmt(post_id, post_model.Post.like_count, -1))
+        await db.commit()
+    return
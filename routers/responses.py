@@ -0,0 +1,29 @@
+# routers/responses.py
+# 讀取路由的快速回應：直接回傳 Response 時 FastAPI 不會再用 response_model 驗證與序列化，
+# 資料由欄位投影的查詢組成 (內部可信資料)，OpenAPI 仍以路由上的 response_model 描述。
+import json
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 沒安裝 orjson 時退回標準庫 json
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """ 以 orjson 編碼 (沒有時用 json，輸出與 FastAPI 預設相同：UTF-8、不跳脫非 ASCII) """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(content, response: Response = None, status_code: int = 200) -> FastJSONResponse:
+    """ response 為路由注入的 Response，帶上其中已設定的標頭 (ETag / Cache-Control 等) """
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,27 @@
+# routers/search.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import Optional
+from cache.http import CACHE_CONTROL_SEARCH
+from db.engine import get_db
+from db.search import SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE_MAX, SEARCH_QUERY_MAX_LENGTH, decode_cursor, search
+from routers.responses import json_response
+from schemas import search as search_schema
+
+router = APIRouter()
+
+@router.get("/api/search", response_model=search_schema.SearchPage)
+def search_posts(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=SEARCH_QUERY_MAX_LENGTH, description="關鍵字，多個詞以空白分隔 (AND)"),
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_PAGE_SIZE_MAX),
+    db: Session = Depends(get_db),
+):
+    """ 搜尋文章標題、內文與留言，依相關度排序並附上標示關鍵字的摘要 """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    response.headers["Cache-Control"] = CACHE_CONTROL_SEARCH
+    return json_response(search(db, q, after, limit), response)
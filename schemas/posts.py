@@ -35,8 +35,25 @@ class PostBase(BaseModel):
 class Post(PostBase):
     id: int
     author: Author # 巢狀顯示作者資訊
+    like_count: int = 0
+    comment_count: int = 0
     model_config = ConfigDict(from_attributes=True)
 
+class PostSummary(BaseModel):
+    """ 文章列表用的精簡版 (不含 content) """
+    id: int
+    slug: str
+    title: str
+    author: Author
+    like_count: int = 0
+    comment_count: int = 0
+    model_config = ConfigDict(from_attributes=True)
+
+class PostPage(BaseModel):
+    """ 文章列表分頁結果，next_cursor 為 None 代表沒有下一頁 """
+    items: List[PostSummary] = []
+    next_cursor: Optional[int] = None
+
 class PostDetail(Post):
     comments: List[Comment] = []
     likes: List[Like] = []
@@ -0,0 +1,16 @@
+# schemas/search.py
+from pydantic import BaseModel
+from typing import List, Optional
+
+class SearchHit(BaseModel):
+    kind: str                         # "post" 或 "comment"
+    slug: str
+    title: str                        # 文章標題 (留言則為所屬文章)
+    comment_id: Optional[int] = None
+    snippet: str                      # 已跳脫的 HTML，符合的詞以 <mark> 標示
+    score: float
+
+class SearchPage(BaseModel):
+    """ 依相關度排序的搜尋結果，next_cursor 為 None 代表沒有下一頁 """
+    items: List[SearchHit] = []
+    next_cursor: Optional[str] = None
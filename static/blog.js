@@ -20,10 +20,47 @@ function cardHTML(p) {
       
       <div class="h-1 w-16 bg-yellow-400 rounded-full mb-3 group-hover:w-24 transition-all duration-300"></div>
 
+      <p class="text-blue-200 text-sm mt-auto">❤️ ${p.like_count ?? 0}　💬 ${p.comment_count ?? 0}</p>
+
     </a>
   `;
 }
 
+let nextCursor = null;
+let isLoadingMore = false;
+let authToken = null;
+
+// 取得一頁文章 (cursor 為上一頁最後一篇的 id)
+async function fetchPostsPage(cursor) {
+  const params = cursor != null ? { cursor } : {};
+  const res = await axios.get('/api/posts', {
+    params,
+    headers: {
+      'Authorization': `Bearer ${authToken}`
+    },
+    timeout: 10000
+  });
+  return res.data;
+}
+
+// 捲動到底部時載入下一頁
+const sentinelEl = document.getElementById('list-sentinel');
+const observer = new IntersectionObserver(async (entries) => {
+  if (!entries.some(e => e.isIntersecting)) return;
+  if (isLoadingMore || nextCursor == null) return;
+  isLoadingMore = true;
+  try {
+    const page = await fetchPostsPage(nextCursor);
+    listEl.insertAdjacentHTML('beforeend', page.items.map(p => cardHTML(p)).join(''));
+    nextCursor = page.next_cursor;
+    if (nextCursor == null) observer.disconnect();
+  } catch (err) {
+    console.error('載入更多文章失敗', err);
+  } finally {
+    isLoadingMore = false;
+  }
+}, { rootMargin: '200px' });
+
 (async function loadPosts() {
   try {
     listEl.innerHTML = '<div class="text-blue-200">正在取得登入狀態...</div>';
@@ -40,27 +77,23 @@ function cardHTML(p) {
 
     // 【修改】3. 如果 user 存在，*才*去取得 Token
     listEl.innerHTML = '<div class="text-blue-200">已登入，正在載入文章...</div>';
-    const token = await getCurrentIdToken(); // 這裡 user 必定存在
+    authToken = await getCurrentIdToken(); // 這裡 user 必定存在
 
-    if (!token) {
+    if (!authToken) {
         // 雖然 user 存在，但 token 取得失敗 (罕見)
         throw new Error("已登入，但無法取得 Token。");
     }
 
-    // 【修改】4. 在請求中附上 Token (這部分不變)
-    const res = await axios.get('/api/posts', {
-      headers: {
-        'Authorization': `Bearer ${token}`
-      },
-      timeout: 10000
-    });
-    
-    const posts = res.data;
+    // 【修改】4. 在請求中附上 Token，先載入第一頁
+    const page = await fetchPostsPage(null);
+    const posts = page.items;
 
     if (!Array.isArray(posts) || posts.length === 0) {
       listEl.innerHTML = '<div class="text-slate-500">目前沒有文章。</div>';
     } else {
       listEl.innerHTML = posts.map(p => cardHTML(p)).join('');
+      nextCursor = page.next_cursor;
+      if (nextCursor != null && sentinelEl) observer.observe(sentinelEl);
     }
   } catch (err) {
     if (err.response && err.response.status === 401) {
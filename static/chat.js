@@ -40,30 +40,57 @@ async function sendMessage() {
 
     // 顯示 AI 思考中
     const loadingId = appendMessage('思考中...', 'ai', true);
+    let replyEl = null;
 
     try {
         // 取得 Token
         const token = await getCurrentIdToken();
         if (!token) throw new Error("無法取得登入憑證");
 
-        // 發送給後端
-        const res = await axios.post('/api/chat', { message: text }, {
-            headers: { 'Authorization': `Bearer ${token}` }
+        // 以 SSE 串流接收回答，收到第一個 token 就開始顯示
+        const res = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${token}`
+            },
+            body: JSON.stringify({ message: text })
         });
+        if (!res.ok) {
+            const err = new Error(`HTTP ${res.status}`);
+            err.status = res.status;
+            throw err;
+        }
 
-        // 成功後移除讀取訊息，並顯示回答
-        removeMessage(loadingId);
-        appendMessage(res.data.reply, 'ai');
+        await readEventStream(res, (event, data) => {
+            if (event === 'error') throw new Error(data.message);
+            if (event !== 'message' || !data.token) return;
+            if (!replyEl) {
+                // 第一個 token 到達：移除讀取訊息，建立回答泡泡
+                removeMessage(loadingId);
+                replyEl = document.querySelector(`#${appendMessage('', 'ai')} > div`);
+                replyEl.classList.add('whitespace-pre-wrap');
+            }
+            replyEl.textContent += data.token;
+            messagesList.scrollTop = messagesList.scrollHeight;
+        });
+
+        if (!replyEl) {
+            removeMessage(loadingId);
+            appendMessage('（沒有收到回答）', 'ai');
+        }
 
     } catch (err) {
         removeMessage(loadingId);
         console.error("Chat Error:", err);
-        const errorMsg = (err.response && err.response.status === 401) 
+        const errorMsg = (err.status === 401) 
             ? '登入已過期，請重新登入。' 
-            : '發生錯誤，請稍後再試。';
+            : (err.status === 503)
+                ? '小幫手忙線中，請稍後再試。'
+                : '發生錯誤，請稍後再試。';
         appendMessage(errorMsg, 'ai');
         
-        if (err.response && err.response.status === 401) {
+        if (err.status === 401) {
             setTimeout(() => window.location.href = 'login.html', 2000);
         }
     } finally {
@@ -73,6 +100,31 @@ async function sendMessage() {
     }
 }
 
+// 逐段讀取 text/event-stream，每收到一筆事件就呼叫 onEvent(event, data)
+async function readEventStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if (event === 'done') return;
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
 // 綁定事件
 if (sendBtn) sendBtn.addEventListener('click', sendMessage);
 if (userInput) userInput.addEventListener('keypress', (e) => {
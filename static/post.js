@@ -38,14 +38,10 @@ async function main() {
     } else {
         console.log("驗證完成，使用者未登入。");
     }
-    const [postRes, likesRes, commentsRes] = await Promise.all([
-      axios.get(`/api/posts/${slug}`),
-      axios.get(`/api/posts/${slug}/likes`),
-      axios.get(`/api/posts/${slug}/comments`)
-    ]);
-    postData = postRes.data;
-    displayedLikesList = likesRes.data || [];
-    displayedCommentsList = commentsRes.data || [];
+    const detailRes = await axios.get(`/api/posts/${slug}/detail`);
+    postData = detailRes.data;
+    displayedLikesList = postData.likes || [];
+    displayedCommentsList = postData.comments || [];
     document.title = postData.title || '文章';
     if (currentUser) {
         const userName = currentUser.displayName || currentUser.email;